@@ -0,0 +1,100 @@
+import atexit
+import fcntl
+import os
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
+
+
+class LockingRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler для нескольких процессов gunicorn.
+
+    Запись и ротация выполняются под flock на файле <имя>.lock.
+    Если файл уже ротировал другой процесс, он открывается заново,
+    а размер проверяется по концу файла, а не по своей позиции.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        self.lock_path = f'{self.baseFilename}.lock'
+
+    @contextmanager
+    def file_lock(self):
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            rotated = (
+                os.stat(self.baseFilename).st_ino
+                != os.fstat(self.stream.fileno()).st_ino
+            )
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self.stream.close()
+            self.stream = self._open()
+        self.stream.seek(0, os.SEEK_END)
+
+    def emit(self, record):
+        with self.file_lock():
+            self.reopen_if_rotated()
+            super().emit(record)
+
+
+class QueueFileHandler(QueueHandler):
+    """
+    Журнал в файл без ожидания диска в потоке запроса.
+
+    Записи ставятся в очередь как есть, без форматирования: сообщение
+    собирается и пишется LockingRotatingFileHandler в потоке
+    QueueListener. После fork (воркеры gunicorn) поток слушателя
+    запускается в процессе заново.
+    """
+
+    def __init__(self, filename, max_bytes=0, backup_count=0):
+        super().__init__(SimpleQueue())
+        self.target = LockingRotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count,
+            encoding='utf-8', delay=True,
+        )
+        self.listener = None
+        self.pid = None
+        atexit.register(self.stop)
+
+    def start(self):
+        self.target.setFormatter(self.formatter)
+        self.queue = SimpleQueue()
+        self.listener = QueueListener(
+            self.queue, self.target, respect_handler_level=False
+        )
+        self.listener.start()
+        self.pid = os.getpid()
+
+    def stop(self):
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+        self.listener = None
+
+    def prepare(self, record):
+        # Форматирование выполняет целевой обработчик в потоке слушателя.
+        return record
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.start()
+        super().enqueue(record)
+
+    def close(self):
+        self.stop()
+        self.target.close()
+        super().close()
@@ -1,48 +1,120 @@
 import json
 import logging
+import random
+import re
 import socket
 import time
 
+from django.conf import settings
+
 request_logger = logging.getLogger('main')
 
+HOSTNAME = socket.gethostname()
+JSON_CONTENT_TYPE = 'application/json'
+BODY_FIELDS = ('request_body', 'response_body')
+
+
+def get_redact_re(fields):
+    """Строковые значения полей fields в JSON, в том числе обрезанные."""
+    names = '|'.join(re.escape(field) for field in fields)
+    return re.compile(rf'"({names})"\s*:\s*"(?:[^"\\]|\\.)*(?:"|$)')
+
+
+REDACT_RE = get_redact_re(settings.REQUEST_LOG_REDACTED_FIELDS)
+
+
+def format_body(body):
+    """Тело (байты, полный размер): начало текста со скрытыми полями."""
+    data, size = body
+    text = REDACT_RE.sub(
+        r'"\1": "***"', data.decode('utf-8', errors='replace')
+    )
+    if size > len(data):
+        return f'{text}... ({size} байт)'
+    return text
+
+
+class RequestLogMessage:
+    """
+    Сообщение журнала запросов. Тела запроса и ответа хранятся
+    байтами и превращаются в текст только при выводе записи —
+    в потоке QueueListener, а не в потоке запроса.
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        data = {
+            key: format_body(value) if key in BODY_FIELDS else value
+            for key, value in self.data.items()
+        }
+        return json.dumps(data, ensure_ascii=False)
+
 
 class RequestLogMiddleware:
-    """Request Logging Middleware."""
+    """
+    Журнал запросов к API.
+
+    Каждый запрос попадает в журнал кратко: адрес, метод, путь,
+    статус и время. Тела JSON-запроса и ответа добавляются к доле
+    REQUEST_LOG_SAMPLE_RATE запросов и ко всем ответам с ошибкой,
+    не длиннее REQUEST_LOG_BODY_LIMIT байт, со скрытыми полями
+    REQUEST_LOG_REDACTED_FIELDS.
+    """
 
     def __init__(self, get_response):
         self.get_response = get_response
 
+    @staticmethod
+    def get_body(content, content_type):
+        if not content_type.startswith(JSON_CONTENT_TYPE):
+            return None
+        return content[:settings.REQUEST_LOG_BODY_LIMIT], len(content)
+
     def __call__(self, request):
-        start_time = time.time()
+        start_time = time.monotonic()
+        request_path = request.get_full_path()
+        is_api = '/api/' in request_path
+        # Файлы и части файлов не читаются в память ради журнала.
+        request_body = (
+            self.get_body(request.body, request.content_type or '')
+            if is_api and request.content_type == JSON_CONTENT_TYPE
+            else None
+        )
+        response = self.get_response(request)
+        status = response.status_code
         log_data = {
-            'remote_address': request.META['REMOTE_ADDR'],
-            'server_hostname': socket.gethostname(),
+            'remote_address': request.META.get('REMOTE_ADDR'),
+            'server_hostname': HOSTNAME,
             'request_method': request.method,
-            'request_path': request.get_full_path(),
+            'request_path': request_path,
+            'response_status': status,
         }
-        if '/api/' in str(request.get_full_path()):
-            req_body = (
-                json.loads(request.body.decode("utf-8"))
-                if request.body else {}
+        if is_api and (
+            status >= 400
+            or random.random() < settings.REQUEST_LOG_SAMPLE_RATE
+        ):
+            if request_body is not None:
+                log_data['request_body'] = request_body
+            response_body = (
+                None if response.streaming
+                else self.get_body(
+                    response.content, response.get('Content-Type', '')
+                )
             )
-            log_data['request_body'] = req_body
-        response = self.get_response(request)
-        response_status = getattr(response, 'status_code', None)
-        log_data['response_status'] = response_status
-        content_type = response.get('content-type', None)
-        if response and content_type == 'application/json':
-            response_body = json.loads(response.content.decode('utf-8'))
-            log_data['response_body'] = response_body
-        log_data['run_time'] = time.time() - start_time
-        if response_status is not None and response_status >= 400:
-            request_logger.error(msg=log_data)
-        else:
-            request_logger.info(msg=log_data)
+            if response_body is not None:
+                log_data['response_body'] = response_body
+        log_data['run_time'] = time.monotonic() - start_time
+        request_logger.log(
+            logging.ERROR if status >= 400 else logging.INFO,
+            RequestLogMessage(log_data),
+        )
         return response
 
     def process_exception(self, request, exception):
-        try:
-            raise exception
-        except Exception as e:
-            request_logger.exception('Необработанное исключение: ' + str(e))
-        return exception
+        request_logger.exception(
+            'Необработанное исключение: %s', exception
+        )
@@ -0,0 +1,117 @@
+import logging
+import re
+import time
+from contextlib import ExitStack
+from hashlib import blake2b
+
+from django.conf import settings
+from django.db import connections, transaction
+
+slow_query_logger = logging.getLogger('slow_queries')
+
+FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def get_fingerprint(sql):
+    """SQL без значений: запросы, отличающиеся только ими, совпадают."""
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def explain(connection, sql, params):
+    """
+    План запроса. EXPLAIN выполняется в точке сохранения: если он
+    не удался, транзакция запроса остаётся рабочей.
+    """
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'{prefix} {sql}', params)
+                rows = cursor.fetchall()
+    except Exception as error:
+        return f'EXPLAIN не выполнен: {error}'
+    return '\n'.join(
+        ' '.join(str(column) for column in row) for row in rows
+    )
+
+
+class SlowQueryLogger:
+    """
+    Обёртка connection.execute_wrapper: пишет в журнал slow_queries
+    запросы дольше SLOW_QUERY_THRESHOLD миллисекунд. Остальные
+    запросы только замеряются.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        # Запросы самого EXPLAIN проходят через эту же обёртку.
+        self.explaining = False
+
+    def get_view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else self.request.path
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start_time = time.monotonic()
+        try:
+            result = execute(sql, params, many, context)
+        except Exception:
+            # План упавшего запроса не запрашивается: исключение
+            # запроса должно дойти до вызывающего кода как есть.
+            self.check(sql, params, many, context, start_time, False)
+            raise
+        self.check(sql, params, many, context, start_time, True)
+        return result
+
+    def check(self, sql, params, many, context, start_time, succeeded):
+        duration = (time.monotonic() - start_time) * 1000
+        if duration < settings.SLOW_QUERY_THRESHOLD:
+            return
+        plan = None
+        if (
+            succeeded and settings.SLOW_QUERY_EXPLAIN and not many
+            and sql.lstrip()[:6].upper() == 'SELECT'
+        ):
+            self.explaining = True
+            try:
+                plan = explain(context['connection'], sql, params)
+            finally:
+                self.explaining = False
+        self.log(sql, context, duration, plan)
+
+    def log(self, sql, context, duration, plan):
+        fingerprint = get_fingerprint(sql)
+        slow_query_logger.warning(
+            'Медленный запрос %.1f мс, строк: %s, представление: %s, '
+            'отпечаток %s: %s%s',
+            duration,
+            getattr(context['cursor'], 'rowcount', None),
+            self.get_view_name(),
+            blake2b(fingerprint.encode(), digest_size=6).hexdigest(),
+            fingerprint,
+            f'\n{plan}' if plan else '',
+        )
+
+
+class SlowQueryLogMiddleware:
+    """Журнал медленных запросов к БД, выполненных при обработке запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_logger = SlowQueryLogger(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_logger))
+            return self.get_response(request)
@@ -0,0 +1,121 @@
+from django.core.cache import caches
+
+from posts.models import Comment, Post
+
+from .serializers import PostSerializer
+from .utils import get_query_param_set
+
+posts_cache = caches['posts']
+
+# Поля представления со ссылками на файлы и с их копиями {размер:
+# {формат: url}}. В кэше ссылки относительные, абсолютными их
+# делает build_absolute_urls для каждого запроса.
+URL_FIELDS = frozenset(('image_link', 'file_link', 'photo'))
+VARIANT_FIELDS = frozenset(('image_variants', 'photo_variants'))
+
+
+def get_post_cache_key(post_id, version):
+    return f'post:{post_id}:{version}'
+
+
+def render_posts(posts, context):
+    """
+    Представления постов из кэша, промахи рендерятся одним запросом.
+
+    posts — объекты с загруженными id и version. Изменение поста
+    увеличивает version, поэтому устаревшие записи не читаются,
+    а вытесняются кэшем. liked_by_me в кэше не хранится,
+    его подставляет apply_liked_by_me. В кэш попадает полное
+    представление без запроса (с относительными ссылками на файлы),
+    ?fields= применяется к уже собранному ответу.
+    """
+    keys = {get_post_cache_key(post.pk, post.version): post.pk
+            for post in posts}
+    rendered = {
+        keys[key]: data for key, data in posts_cache.get_many(keys).items()
+    }
+    missing = [post.pk for post in posts if post.pk not in rendered]
+    if missing:
+        fresh = list(Post.objects.filter(pk__in=missing).with_related())
+        serializer = PostSerializer(
+            fresh, many=True,
+            context={**context, 'request': None, 'dynamic_fields': False},
+        )
+        fragments = {}
+        for post, data in zip(fresh, serializer.data):
+            rendered[post.pk] = fragments[
+                get_post_cache_key(post.pk, post.version)
+            ] = data
+        posts_cache.set_many(fragments)
+    data = [rendered[post.pk] for post in posts if post.pk in rendered]
+    request = context['request']
+    return select_fields(
+        build_absolute_urls(apply_liked_by_me(data, request.user), request),
+        get_query_param_set(request, PostSerializer.fields_query_param),
+    )
+
+
+def build_absolute_urls(value, request):
+    """Ссылки на файлы в представлении — абсолютные для request."""
+    if isinstance(value, list):
+        return [build_absolute_urls(item, request) for item in value]
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for name, item in value.items():
+        if not item:
+            result[name] = item
+        elif name in URL_FIELDS:
+            result[name] = request.build_absolute_uri(item)
+        elif name in VARIANT_FIELDS:
+            result[name] = {
+                size: {
+                    extension: request.build_absolute_uri(url)
+                    for extension, url in urls.items()
+                }
+                for size, urls in item.items()
+            }
+        else:
+            result[name] = build_absolute_urls(item, request)
+    return result
+
+
+def select_fields(data, fields):
+    if not fields:
+        return data
+    return [
+        {name: value for name, value in item.items() if name in fields}
+        for item in data
+    ]
+
+
+def get_liked_ids(model, user, ids):
+    if not ids or not user.is_authenticated:
+        return set()
+    field = model._meta.get_field(model.likes_field)
+    object_field = f'{field.m2m_field_name()}_id'
+    return set(
+        field.remote_field.through.objects.filter(
+            customuser_id=user.pk, **{f'{object_field}__in': ids}
+        ).values_list(object_field, flat=True)
+    )
+
+
+def apply_liked_by_me(data, user):
+    """Персональная часть представления: лайки поста и комментариев."""
+    liked_posts = get_liked_ids(Post, user, [item['id'] for item in data])
+    liked_comments = get_liked_ids(
+        Comment, user,
+        [comment['id'] for item in data for comment in item['comments']],
+    )
+    return [
+        {
+            **item,
+            'liked_by_me': item['id'] in liked_posts,
+            'comments': [
+                {**comment, 'liked_by_me': comment['id'] in liked_comments}
+                for comment in item['comments']
+            ],
+        }
+        for item in data
+    ]
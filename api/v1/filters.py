@@ -0,0 +1,78 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.filters import BaseFilterBackend
+
+from posts.search import search_posts
+from users.search import search_users
+
+
+class BaseSearchFilter(BaseFilterBackend):
+    """Поиск по строке из параметра search_param через search()."""
+
+    search_param = None
+    search_title = _('Search')
+    search_description = _('Поисковая строка.')
+
+    def get_search_query(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def search(self, queryset, query):
+        raise NotImplementedError('.search() must be overridden.')
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if not query:
+            return queryset
+        return self.search(queryset, query)
+
+    def get_schema_fields(self, view):
+        return [
+            coreapi.Field(
+                name=self.search_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title=str(self.search_title),
+                    description=str(self.search_description),
+                ),
+            )
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': str(self.search_description),
+                'schema': {'type': 'string'},
+            },
+        ]
+
+
+class PostSearchFilter(BaseSearchFilter):
+    """
+    Полнотекстовый поиск постов по ?q= через индекс
+    (tsvector + GIN в PostgreSQL, FTS5 в SQLite).
+    Результаты отсортированы по релевантности, затем по дате.
+    """
+
+    search_param = 'q'
+    ordering = ('-search_rank', '-created_at', '-id')
+
+    def search(self, queryset, query):
+        return search_posts(queryset, query).order_by(*self.ordering)
+
+
+class TrigramSearchFilter(BaseSearchFilter):
+    """
+    Нечёткий поиск пользователей по ?search=: опечатки допустимы,
+    результаты отсортированы по сходству. В PostgreSQL работает
+    по GIN-индексам pg_trgm, в SQLite — по индексу в памяти процесса.
+    """
+
+    search_param = 'search'
+    search_description = _('Фамилия, имя, должность, отдел или email.')
+
+    def search(self, queryset, query):
+        return search_users(queryset, query)
@@ -1,6 +1,11 @@
+from datetime import timedelta
+
 from django.contrib.auth.base_user import BaseUserManager
+from django.db.models import Case, IntegerField, Q, Value, When
 from django.utils.translation import gettext_lazy as _
 
+from users.utils import get_birthday_key
+
 
 class CustomUserManager(BaseUserManager):
     """
@@ -34,3 +39,29 @@ class CustomUserManager(BaseUserManager):
         if extra_fields.get("is_superuser") is not True:
             raise ValueError(_("Superuser must have is_superuser=True."))
         return self.create_user(email, password, **extra_fields)
+
+    def upcoming_birthdays(self, today, days):
+        """
+        Пользователи с днём рождения от today до today + days
+        включительно в порядке наступления. Фильтр — диапазон по
+        индексированному birthday_key, окно может переходить
+        через Новый год.
+        """
+        start = get_birthday_key(today)
+        if days >= 365:
+            window = Q(birthday_key__isnull=False)
+        else:
+            end = get_birthday_key(today + timedelta(days=days))
+            window = (
+                Q(birthday_key__range=(start, end)) if start <= end
+                else Q(birthday_key__gte=start) | Q(birthday_key__lte=end)
+            )
+        return self.filter(window).order_by(
+            Case(
+                When(birthday_key__gte=start, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            'birthday_key',
+            'id',
+        )
@@ -1,6 +1,20 @@
+from hashlib import sha1
+
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.status import HTTP_405_METHOD_NOT_ALLOWED
+from rest_framework.status import (HTTP_200_OK, HTTP_201_CREATED,
+                                   HTTP_405_METHOD_NOT_ALLOWED)
+
+from users.stamps import get_stamps
+
+from .cache import render_posts
+from .pagination import ThroughUserPagination
+from .serializers import LikeSerializer, UserShortInfoSerializer
+from .utils import full_response_requested
 
 
 class UpdateListRetrieveViewSet(
@@ -25,3 +39,144 @@ class UpdateListRetrieveViewSet(
 
 class CreateViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
     pass
+
+
+class LikeMixin:
+    """
+    Лайк объекта, его отмена и список лайкнувших.
+
+    По умолчанию отвечает компактным {id, liked, like_count},
+    полный объект возвращается по ?full=true.
+    """
+
+    like_model = None
+
+    def get_like_target(self):
+        return get_object_or_404(
+            self.like_model.objects.only('id', 'likes_count'),
+            pk=self.kwargs[self.lookup_field],
+        )
+
+    def get_like_response(self, obj, liked, status):
+        if full_response_requested(self.request):
+            instance = self.like_model.objects.with_related(
+                self.request.user
+            ).get(pk=obj.pk)
+            data = self.get_serializer(instance).data
+        else:
+            data = LikeSerializer(
+                {'id': obj.pk, 'liked': liked, 'like_count': obj.likes_count}
+            ).data
+        return Response(data, status=status)
+
+    @action(
+        url_path='like',
+        methods=('POST',),
+        detail=True,
+    )
+    def set_like(self, request, *args, **kwargs):
+        """Лайкнуть объект."""
+        obj = self.get_like_target()
+        obj.add_like(request.user)
+        return self.get_like_response(obj, True, HTTP_201_CREATED)
+
+    @set_like.mapping.delete
+    def delete_like(self, request, *args, **kwargs):
+        """Отменить лайк."""
+        obj = self.get_like_target()
+        obj.remove_like(request.user)
+        return self.get_like_response(obj, False, HTTP_200_OK)
+
+    @action(
+        url_path='likes',
+        methods=('GET',),
+        detail=True,
+        pagination_class=ThroughUserPagination,
+    )
+    def likers(self, request, *args, **kwargs):
+        """Пользователи, лайкнувшие объект."""
+        through, lookup = self.get_like_target().get_like_relation()
+        page = self.paginate_queryset(
+            through.objects.filter(**lookup).select_related('customuser')
+        )
+        serializer = UserShortInfoSerializer(
+            [like.customuser for like in page],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return self.get_paginated_response(serializer.data)
+
+
+class CachedPostMixin:
+    """
+    Список и детальный просмотр постов из кэша представлений.
+
+    Запрос страницы читает только id, version и поля сортировки,
+    сами посты собираются render_posts из api.v1.cache.
+    """
+
+    cache_fields = ('id', 'version', 'created_at')
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).only(
+            *self.cache_fields
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(
+                render_posts(queryset, self.get_serializer_context())
+            )
+        return self.get_paginated_response(
+            render_posts(page, self.get_serializer_context())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        data = render_posts((instance,), self.get_serializer_context())
+        return Response(data[0])
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET для list и retrieve.
+
+    ETag собирается из отметок коллекций (etag_collections) из
+    users.stamps, которые меняют сигналы при изменении данных, —
+    без запросов к БД и сериализации ответа: при совпадении
+    с If-None-Match сразу отдаётся 304. В ETag входят пользователь,
+    полный путь запроса и тип ответа, поэтому разные страницы
+    и клиенты не смешиваются.
+    """
+
+    etag_collections = ()
+
+    def get_etag_collections(self):
+        return self.etag_collections
+
+    def get_etag(self):
+        request = self.request
+        key = repr((
+            request.user.pk,
+            request.get_full_path(),
+            request.accepted_media_type,
+            get_stamps(self.get_etag_collections()),
+        ))
+        return quote_etag(sha1(key.encode()).hexdigest())
+
+    def conditional_get(self, handler, request, *args, **kwargs):
+        etag = self.get_etag()
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -1,5 +1,297 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.translation import gettext_lazy as _
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, LimitOffsetPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class AddressBookSetPagination(PageNumberPagination):
     page_size = 5
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничный вывод по ключу (keyset/cursor).
+
+    Позиция страницы — значения полей сортировки последней записи,
+    поэтому запрос любой страницы стоит одинаково: фильтр по индексу
+    вместо OFFSET и без COUNT(*). Курсоры непрозрачны для клиента.
+    Если ordering не задан, используется сортировка queryset,
+    а при её отсутствии — Meta.ordering модели.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = None
+    invalid_cursor_message = _('Неверный курсор.')
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset)
+        position, self.reverse = self.decode_cursor(request, len(ordering))
+
+        if self.reverse:
+            queryset = queryset.order_by(
+                *(self.invert_field(field) for field in ordering)
+            )
+        else:
+            queryset = queryset.order_by(*ordering)
+        if position is not None:
+            position = self.parse_position(queryset, ordering, position)
+            queryset = queryset.filter(
+                self.get_position_filter(ordering, position, self.reverse)
+            )
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        self.page = results[:page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_previous = has_more
+            self.has_next = position is not None
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.ordering_fields = ordering
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = (
+            self.ordering
+            or queryset.query.order_by
+            or queryset.model._meta.ordering
+        )
+        return tuple(
+            field for field in ordering if isinstance(field, str)
+        )
+
+    @staticmethod
+    def invert_field(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def get_position_filter(ordering, position, reverse):
+        """
+        Лексикографическое сравнение кортежа полей сортировки:
+        (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y).
+        """
+        conditions = []
+        for index, field in enumerate(ordering):
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            equal = {
+                prev.lstrip('-'): value
+                for prev, value in zip(ordering[:index], position)
+            }
+            conditions.append(
+                Q(**equal, **{f'{name}__{lookup}': position[index]})
+            )
+        return reduce(or_, conditions)
+
+    def decode_cursor(self, request, length):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            data = json.loads(urlsafe_b64decode(encoded + padding))
+            position, reverse = data['p'], bool(data.get('r'))
+        except (BinasciiError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != length:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def get_ordering_field(queryset, name):
+        """Поле модели (в том числе через связи) или аннотации."""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        opts = queryset.model._meta
+        *path, name = name.split(LOOKUP_SEP)
+        for part in path:
+            opts = opts.get_field(part).related_model._meta
+        return opts.get_field(name)
+
+    def parse_position(self, queryset, ordering, position):
+        """
+        Значения курсора, приведённые к типам полей сортировки: курсор
+        приходит от клиента и может быть подделан.
+        """
+        values = []
+        for field, value in zip(ordering, position):
+            try:
+                value = self.get_ordering_field(
+                    queryset, field.lstrip('-')
+                ).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, instance, reverse=False):
+        position = [
+            self.get_field_value(instance, field.lstrip('-'))
+            for field in self.ordering_fields
+        ]
+        data = json.dumps({'p': position, 'r': int(reverse)})
+        encoded = urlsafe_b64encode(data.encode()).decode().rstrip('=')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def get_field_value(instance, field):
+        value = instance
+        for attr in field.split('__'):
+            value = getattr(value, attr)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if hasattr(value, 'pk'):
+            return value.pk
+        return value
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_fields(self, view):
+        return [
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Cursor', description='Курсор страницы.'
+                ),
+            ),
+            coreapi.Field(
+                name=self.page_size_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.Integer(
+                    title='Limit', description='Размер страницы.'
+                ),
+            ),
+        ]
+
+
+class ThroughUserPagination(KeysetPagination):
+    """
+    Пользователи из промежуточной таблицы: лайкнувшие, подписчики
+    группы. Ключ — id пользователя, который вместе с id объекта
+    входит в уникальный индекс таблицы.
+    """
+
+    ordering = ('customuser_id',)
+
+
+class FeedPagination(LimitOffsetPagination):
+    """
+    Limit/offset по умолчанию, курсорный режим — по запросу.
+
+    Курсорный режим включается параметром ?pagination=cursor
+    (ссылки next/previous сохраняют его) или наличием ?cursor=.
+    В нём не считается общее количество записей. Поиск (?q=)
+    всегда выводится по курсору: выдача сортируется по
+    релевантности, и OFFSET по ней пришлось бы считать заново.
+    """
+
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    search_query_param = 'q'
+    keyset_class = KeysetPagination
+
+    def use_keyset(self, request):
+        keyset_param = self.keyset_class.cursor_query_param
+        return (
+            request.query_params.get(self.mode_query_param)
+            == self.cursor_mode
+            or keyset_param in request.query_params
+            or self.search_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_fields(self, view):
+        return super().get_schema_fields(view) + [
+            coreapi.Field(
+                name=self.mode_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Pagination mode',
+                    description='cursor — постраничный вывод по курсору.',
+                ),
+            ),
+            self.keyset_class().get_schema_fields(view)[0],
+        ]
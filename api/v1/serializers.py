@@ -1,10 +1,15 @@
-from datetime import date, datetime
+import os
+from datetime import date
 
 import filetype
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from django.core.exceptions import ValidationError
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.storage import default_storage
 from django.db import transaction
+from django.db.models import Manager
+from django.utils.text import get_valid_filename
 from drf_extra_fields.fields import (
     Base64FileField, Base64ImageField, HybridImageField
 )
@@ -12,28 +17,111 @@ from rest_framework import serializers
 from rest_framework.relations import SlugRelatedField
 from rest_framework.validators import UniqueValidator
 
-from api.v1.utils import del_files, del_images
-from posts.models import Comment, File, Group, Image, Post
+from api.v1.utils import get_query_param_set
+from posts.models import Comment, File, Group, Image, Post, Upload
+from posts.uploads import attach_uploads
+from posts.variants import get_variant_urls, schedule_variants
 
 CustomUser = get_user_model()
 
 
+def get_liked_by_me(obj, context):
+    """
+    Берёт аннотацию liked_by_me, для объектов без неё (например,
+    только что созданных) проверяет лайк отдельным запросом.
+    """
+    liked_by_me = getattr(obj, 'liked_by_me', None)
+    if liked_by_me is not None:
+        return liked_by_me
+    request = context.get('request')
+    if request is None or not request.user.is_authenticated:
+        return False
+    through, lookup = obj.get_like_relation()
+    return through.objects.filter(
+        customuser_id=request.user.pk, **lookup
+    ).exists()
+
+
+class DynamicFieldsMixin:
+    """
+    Выбор полей ответа параметрами GET-запроса.
+
+    ?fields=id,text — только перечисленные поля, ?expand=posts —
+    добавить поля из Meta.expandable_fields, которые по умолчанию
+    не выводятся. Параметры действуют на сериализатор верхнего
+    уровня, вложенные выводятся без раскрываемых полей.
+    """
+
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_dynamic_request(self):
+        """Запрос, параметры которого применяются к этому сериализатору."""
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        if not self.context.get('dynamic_fields', True):
+            return None
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return request if parent is None else None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.get_dynamic_request()
+        expand = get_query_param_set(request, self.expand_query_param)
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name not in expand:
+                fields.pop(name, None)
+        only = get_query_param_set(request, self.fields_query_param)
+        if only:
+            return {
+                name: field for name, field in fields.items()
+                if name in only
+            }
+        return fields
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Ссылки на уменьшенные копии изображения: {размер: {формат: url}}.
+    Недостающая копия создаётся при первом обращении по ссылке.
+    """
+
+    def to_representation(self, value):
+        name = getattr(value, 'name', value)
+        if not name:
+            return None
+        request = self.context.get('request')
+        return {
+            size: {
+                extension: request.build_absolute_uri(url) if request else url
+                for extension, url in urls.items()
+            }
+            for size, urls in get_variant_urls(name).items()
+        }
+
+
 class ImageSerializer(serializers.ModelSerializer):
     """Сериализация изображений."""
 
     image_link = Base64ImageField(required=False)
+    image_variants = ImageVariantsField(source='image_link')
 
     class Meta:
-        fields = ('image_link',)
+        fields = ('image_link', 'image_variants')
         model = Image
 
 
 class IdPhotoUserSerializer(serializers.ModelSerializer):
     """Short representation of User for groups serialization."""
 
+    photo_variants = ImageVariantsField(source='photo')
+
     class Meta:
         model = CustomUser
-        fields = ('id', 'photo')
+        fields = ('id', 'photo', 'photo_variants')
 
 
 class FileField(Base64FileField):
@@ -63,43 +151,173 @@ class FileSerializer(serializers.ModelSerializer):
             return f'https://csn.sytes.net/media/{str(obj.file_link)}'
 
 
+class UploadSerializer(serializers.ModelSerializer):
+    """
+    Загрузка файла: multipart с полем file целиком или JSON с именем
+    и размером файла, части которого придут отдельными запросами.
+    """
+
+    file = serializers.FileField(write_only=True, required=False)
+    filename = serializers.CharField(max_length=255, required=False)
+    size = serializers.IntegerField(min_value=1, required=False)
+    is_complete = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Upload
+        fields = (
+            'token', 'filename', 'size', 'offset', 'extension',
+            'is_complete', 'file',
+        )
+        read_only_fields = ('token', 'offset', 'extension')
+
+    def validate(self, attrs):
+        file = attrs.get('file')
+        if file is not None:
+            attrs.setdefault('filename', file.name)
+            attrs['size'] = file.size
+        if not attrs.get('filename') or not attrs.get('size'):
+            raise serializers.ValidationError(
+                'Нужен файл или его имя и размер.'
+            )
+        try:
+            attrs['filename'] = get_valid_filename(
+                os.path.basename(attrs['filename'])
+            )
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError(
+                {'filename': 'Недопустимое имя файла.'}
+            )
+        if attrs['size'] > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Размер файла больше {settings.UPLOAD_MAX_SIZE} байт.'
+            )
+        return attrs
+
+
 class UserShortInfoSerializer(serializers.ModelSerializer):
     """Короткая информация о пользователе в постах"""
+    photo_variants = ImageVariantsField(source='photo')
+
     class Meta:
         model = CustomUser
         fields = (
-            'id', 'first_name', 'last_name', 'photo', 'is_staff'
+            'id', 'first_name', 'last_name', 'photo', 'photo_variants',
+            'is_staff'
+        )
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Список постов. Превью комментариев для всех постов
+    загружается одним запросом.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, Manager) else data)
+        attach_comments_preview(
+            [post for post in posts if not hasattr(post, 'comments_preview')],
+            self.context,
         )
+        return super().to_representation(posts)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class ExpandedPostsListSerializer(serializers.ListSerializer):
+    """
+    Список объектов с раскрываемым списком постов Meta.posts_field.
+    Превью комментариев для постов всей страницы загружается одним
+    запросом, а не отдельно для каждого объекта.
+    """
+
+    def to_representation(self, data):
+        objs = list(data.all() if isinstance(data, Manager) else data)
+        posts_field = self.child.Meta.posts_field
+        if posts_field in self.child.fields:
+            attach_comments_preview(
+                [
+                    post for obj in objs
+                    for post in getattr(obj, posts_field).all()
+                ],
+                self.context,
+            )
+        return super().to_representation(objs)
+
+
+def attach_comments_preview(posts, context):
+    """Сохраняет в пост последние COMMENTS_PREVIEW_SIZE комментариев."""
+    request = context.get('request')
+    previews = {post.pk: [] for post in posts}
+    commented = [post.pk for post in posts if post.comments_count]
+    if commented:
+        comments = Comment.objects.latest_for_posts(
+            commented, settings.COMMENTS_PREVIEW_SIZE
+        ).with_related(getattr(request, 'user', None))
+        for comment in comments:
+            previews[comment.post_id].append(comment)
+    for post in posts:
+        post.comments_preview = previews[post.pk]
+
+
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Сериализация модели Post."""
 
     author = UserShortInfoSerializer(read_only=True)
-    like_count = serializers.SerializerMethodField()
+    like_count = serializers.IntegerField(
+        source='likes_count', read_only=True
+    )
     images = ImageSerializer(many=True, required=False)
     files = FileSerializer(many=True, required=False)
     group = serializers.PrimaryKeyRelatedField(
         queryset=Group.objects.all(), required=False
     )
+    uploads = serializers.SlugRelatedField(
+        slug_field='token',
+        queryset=Upload.objects.all(),
+        many=True,
+        write_only=True,
+        required=False,
+    )
+    liked_by_me = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
 
     class Meta:
         fields = (
-            'id', 'text', 'author', 'pub_date', 'update_date',
-            'images', 'files', 'like_count', 'likes', 'group', 'comments'
+            'id', 'text', 'author', 'pub_date', 'created_at', 'update_date',
+            'images', 'files', 'uploads', 'like_count', 'liked_by_me',
+            'group', 'comments_count', 'comments'
         )
+        read_only_fields = ('comments_count',)
         model = Post
+        list_serializer_class = PostListSerializer
 
-    def get_like_count(self, obj_post):
-        """Вычисляет количество лайков у поста."""
-        return obj_post.likes.count()
+    def get_liked_by_me(self, obj):
+        return get_liked_by_me(obj, self.context)
 
     def get_comments(self, obj):
-        queryset = Comment.objects.filter(post=obj)
-        serializer = CommentSerializer(queryset, many=True)
+        """Последние комментарии поста, полный список — в /comments/."""
+        if not hasattr(obj, 'comments_preview'):
+            attach_comments_preview([obj], self.context)
+        serializer = CommentSerializer(
+            obj.comments_preview, many=True, context=self.context
+        )
         return serializer.data
 
+    def validate_uploads(self, uploads):
+        """Прикрепить можно только свои завершённые загрузки."""
+        user = self.context['request'].user
+        if any(
+            upload.owner_id != user.pk or not upload.is_complete
+            or upload.is_expired
+            for upload in uploads
+        ):
+            raise serializers.ValidationError(
+                'Загрузка не найдена или ещё не завершена.'
+            )
+        if len(uploads) > 10:
+            raise serializers.ValidationError(
+                'Возможно добавление не более 10 файлов.'
+            )
+        return uploads
+
     @staticmethod
     def create_images(post, images):
         """Сохраняет картинки к посту."""
@@ -109,7 +327,8 @@ class PostSerializer(serializers.ModelSerializer):
                 image_link=image.get('image_link')
             ) for image in images if image
         )
-        Image.objects.bulk_create(objs_image)
+        images = Image.objects.bulk_create(objs_image)
+        schedule_variants(image.image_link.name for image in images)
 
     @staticmethod
     def create_files(post, files):
@@ -123,8 +342,31 @@ class PostSerializer(serializers.ModelSerializer):
         )
         File.objects.bulk_create(objs_file)
 
+    @staticmethod
+    def lock_uploads(uploads):
+        """
+        Блокирует загрузки до конца транзакции. Загрузку, которую успел
+        прикрепить другой запрос, уже удалили — пост не создаётся.
+        """
+        pks = [upload.pk for upload in uploads]
+        locked = Upload.objects.active().select_for_update().in_bulk(pks)
+        if len(locked) != len(pks):
+            raise serializers.ValidationError(
+                {'uploads': 'Загрузка не найдена или ещё не завершена.'}
+            )
+        return [locked[pk] for pk in pks]
+
     @transaction.atomic
     def create(self, validate_data):
+        uploads = validate_data.pop('uploads', None)
+        if uploads:
+            uploads = self.lock_uploads(uploads)
+        post = self.create_post(validate_data)
+        if uploads:
+            attach_uploads(post, uploads)
+        return post
+
+    def create_post(self, validate_data):
         attrib = {
             'images': None,
             'files': None
@@ -150,6 +392,15 @@ class PostSerializer(serializers.ModelSerializer):
 
     @transaction.atomic()
     def update(self, instance, validate_data):
+        uploads = validate_data.pop('uploads', None)
+        if uploads:
+            uploads = self.lock_uploads(uploads)
+        instance = self.update_post(instance, validate_data)
+        if uploads:
+            attach_uploads(instance, uploads)
+        return instance
+
+    def update_post(self, instance, validate_data):
         attrib = {
             'images': None,
             'files': None
@@ -162,7 +413,6 @@ class PostSerializer(serializers.ModelSerializer):
         if is_image_file:
             super().update(instance, validate_data)
             if attrib['images']:
-                del_images(instance)
                 Image.objects.filter(post=instance).delete()
                 self.create_images(instance, attrib['images'])
             if attrib['files']:
@@ -170,19 +420,19 @@ class PostSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError(
                         'Возможно добавление не более 10 файлов.'
                     )
-                del_files(instance)
                 File.objects.filter(post=instance).delete()
                 self.create_files(instance, attrib['files'])
             return instance
         return super().update(instance, validate_data)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for users endpoint.
     """
     email = serializers.CharField(read_only=True)
     photo = Base64ImageField(required=False)
+    photo_variants = ImageVariantsField(source='photo')
     birthday_day = serializers.SerializerMethodField()
     birthday_month = serializers.SerializerMethodField()
     posts = PostSerializer(many=True)
@@ -194,8 +444,12 @@ class UserSerializer(serializers.ModelSerializer):
             'id', 'email', 'first_name', 'last_name', 'middle_name',
             'job_title', 'personal_email', 'corporate_phone_number',
             'personal_phone_number', 'birthday_day', 'birthday_month',
-            'bio', 'photo', 'department', 'posts', 'followings'
+            'bio', 'photo', 'photo_variants', 'department', 'posts',
+            'followings'
         )
+        expandable_fields = ('posts', 'followings')
+        posts_field = 'posts'
+        list_serializer_class = ExpandedPostsListSerializer
 
     def get_birthday_day(self, obj):
         if obj.birthday_date:
@@ -206,17 +460,38 @@ class UserSerializer(serializers.ModelSerializer):
             return obj.birthday_date.month
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     author = UserShortInfoSerializer(read_only=True)
-    like_count = serializers.SerializerMethodField()
+    like_count = serializers.IntegerField(
+        source='likes_count', read_only=True
+    )
+    liked_by_me = serializers.SerializerMethodField()
 
     class Meta:
-        fields = ('id', 'text', 'author', 'pub_date', 'like_count', 'like')
+        fields = (
+            'id', 'text', 'author', 'pub_date', 'created_at',
+            'like_count', 'liked_by_me'
+        )
         model = Comment
 
-    def get_like_count(self, obj):
-        """Вычисляет количество лайков у комментария."""
-        return obj.like.count()
+    def get_liked_by_me(self, obj):
+        return get_liked_by_me(obj, self.context)
+
+
+class LikeSerializer(serializers.Serializer):
+    """Состояние лайка после его постановки или отмены."""
+
+    id = serializers.IntegerField()
+    liked = serializers.BooleanField()
+    like_count = serializers.IntegerField()
+
+
+class SubscribeSerializer(serializers.Serializer):
+    """Состояние подписки на группу после её изменения."""
+
+    id = serializers.IntegerField()
+    subscribed = serializers.BooleanField()
+    followers_count = serializers.IntegerField()
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -229,14 +504,17 @@ class ChangePasswordSerializer(serializers.Serializer):
     current_password = serializers.CharField(required=True)
 
 
-class GroupSerializer(serializers.Serializer):
+class GroupSerializer(DynamicFieldsMixin, serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     author = SlugRelatedField(slug_field='id', read_only=True)
     title = serializers.CharField(read_only=True)
     description = serializers.CharField(read_only=True)
-    followers_count = serializers.ReadOnlyField(source='followers.count')
+    followers_count = serializers.IntegerField(read_only=True)
+    posts_count = serializers.IntegerField(read_only=True)
+    is_subscribed = serializers.BooleanField(read_only=True)
     created_date = serializers.DateTimeField()
     image_link = Base64ImageField(required=False)
+    image_variants = ImageVariantsField(source='image_link')
     followers = IdPhotoUserSerializer(many=True)
     resume = serializers.CharField(read_only=True)
     posts_group = PostSerializer(read_only=True, many=True)
@@ -245,18 +523,29 @@ class GroupSerializer(serializers.Serializer):
         model = Group
         fields = (
             'title', 'description', 'created_date',
-            'author', 'image_link', 'followers_count',
-            'followers', 'posts_group', 'resume'
+            'author', 'image_link', 'image_variants', 'followers_count',
+            'posts_count',
+            'is_subscribed', 'followers', 'posts_group', 'resume'
         )
+        # Полные списки — по ?expand=, постранично — /groups/{id}/posts/
+        # и /groups/{id}/followers/.
+        expandable_fields = ('followers', 'posts_group')
+        posts_field = 'posts_group'
+        list_serializer_class = ExpandedPostsListSerializer
 
 
 class ShortInfoSerializer(UserSerializer):
     """Serializer for show short info about user."""
     posts_count = serializers.IntegerField()
+    comments_count = serializers.IntegerField()
+    likes_received = serializers.IntegerField()
 
     class Meta:
         model = CustomUser
-        fields = ('first_name', 'middle_name', 'job_title', 'posts_count')
+        fields = (
+            'first_name', 'middle_name', 'job_title', 'posts_count',
+            'comments_count', 'likes_received'
+        )
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -340,35 +629,51 @@ class CreateCustomUserSerializer(serializers.ModelSerializer):
 
 class BirthdaySerializer(serializers.ModelSerializer):
     """Сериализер для дней рождений"""
-    birthday_date = serializers.DateField()
+    birthday_date = serializers.DateField(format='%d %B')
+    photo_variants = ImageVariantsField(source='photo')
 
     class Meta:
         model = CustomUser
         fields = (
             'id',
             'photo',
+            'photo_variants',
             'first_name',
             'last_name',
             'birthday_date',
         )
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        birthday_date = representation.get('birthday_date')
-        new_format = datetime.strptime(birthday_date, '%Y-%m-%d').date()
-        representation['birthday_date'] = new_format.strftime('%d %B')
-        return representation
-
 
-class AddressBookSerializer(serializers.ModelSerializer):
+class AddressBookSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for addressbook.
     """
     email = serializers.CharField(read_only=True)
+    photo_variants = ImageVariantsField(source='photo')
 
     class Meta:
         model = CustomUser
         fields = (
             'id', 'email', 'first_name', 'middle_name', 'last_name',
-            'job_title', 'corporate_phone_number', 'photo', 'department'
+            'job_title', 'corporate_phone_number', 'photo', 'photo_variants',
+            'department'
         )
+
+
+class UserAutocompleteSerializer(serializers.Serializer):
+    """Пользователь в автодополнении, строится из индекса без БД."""
+
+    id = serializers.IntegerField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+    middle_name = serializers.CharField()
+    job_title = serializers.CharField()
+    photo = serializers.SerializerMethodField()
+    photo_variants = ImageVariantsField(source='photo')
+
+    def get_photo(self, obj):
+        if not obj['photo']:
+            return None
+        url = default_storage.url(obj['photo'])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -2,9 +2,10 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (AddressBookView, BirthdayList, ChangePasswordView,
-                    CommentsViewSet, CreateUsersViewSet, GroupViewSet,
-                    PostViewSet, ShortInfoView, TokenCreateView,
-                    UserPostsViewSet, UsersViewSet, СhangedTokenDestroyView)
+                    CommentsViewSet, CreateUsersViewSet, FeedView,
+                    GroupViewSet, PostViewSet, ShortInfoView,
+                    TokenCreateView, UploadViewSet, UserPostsViewSet,
+                    UsersViewSet, СhangedTokenDestroyView)
 
 app_name = 'api'
 
@@ -12,6 +13,7 @@ router_v1 = DefaultRouter()
 router_v1.register(r'posts', PostViewSet, basename='posts')
 router_v1.register(r'users', UsersViewSet, basename='users')
 router_v1.register(r'groups', GroupViewSet, basename='groups')
+router_v1.register(r'uploads', UploadViewSet, basename='uploads')
 router_v1.register(
     r'posts/(?P<posts_id>\d+)/comments', CommentsViewSet, basename='comments'
 )
@@ -40,6 +42,7 @@ urlpatterns = [
         name='users-short-info'
     ),
     path('birthday_list/', BirthdayList.as_view()),
+    path('feed/', FeedView.as_view(), name='feed'),
     path('addressbook', AddressBookView.as_view()),
     path('', include(router_v1.urls)),
 ]
@@ -1,29 +1,31 @@
-import os
+import re
 
-from config.settings import BASE_DIR, MEDIA_URL
+TRUE_VALUES = ('1', 'true', 'yes')
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
 
 
-def del_images(post):
-    """Удаление изображений, связанных с постом."""
-    links = [
-        BASE_DIR + MEDIA_URL + image_link[0]
-        for image_link in post.images.all().values_list('image_link')
-    ]
-    for link in links:
-        try:
-            os.remove(link)
-        except FileNotFoundError:
-            pass
+def full_response_requested(request):
+    """Клиент запросил полный объект вместо компактного ответа."""
+    return request.query_params.get('full', '').lower() in TRUE_VALUES
 
 
-def del_files(post):
-    """Удаление файлов, связанных с постом."""
-    links = [
-        BASE_DIR + MEDIA_URL + file_link[0]
-        for file_link in post.files.all().values_list('file_link')
-    ]
-    for link in links:
-        try:
-            os.remove(link)
-        except FileNotFoundError:
-            pass
+def get_query_param_set(request, name):
+    """Значения параметра запроса вида ?name=a,b,c."""
+    if request is None:
+        return set()
+    value = request.query_params.get(name, '')
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def parse_content_range(value):
+    """
+    (start, end, size) из заголовка Content-Range: bytes 0-99/1000,
+    None — если заголовка нет или он неверный.
+    """
+    match = CONTENT_RANGE_RE.match(value or '')
+    if match is None:
+        return None
+    start, end, size = map(int, match.groups())
+    if start > end or end >= size:
+        return None
+    return start, end, size
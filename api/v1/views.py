@@ -1,41 +1,59 @@
-import datetime as dt
-
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db.models import IntegerField, Q, Value
+from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext as _
 from djoser.serializers import TokenCreateSerializer, TokenSerializer
 from djoser.utils import ActionViewMixin, login_user
 from djoser.views import TokenDestroyView
-from drf_yasg.utils import swagger_auto_schema
-from rest_framework import (filters, generics, permissions, serializers,
-                            status, viewsets)
+from drf_yasg import openapi
+from drf_yasg.utils import no_body, swagger_auto_schema
+from rest_framework import (filters, generics, mixins, permissions,
+                            serializers, status, viewsets)
 from rest_framework.decorators import action
 from rest_framework.generics import CreateAPIView, ListAPIView
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from posts.models import Comment, Group, Post
+from posts.feed import follow_groups, get_home_feed, unfollow_groups
+from posts.models import Comment, Group, Post, Upload
+from posts.uploads import discard_upload, write_chunk
+from posts.utils import count_subquery, sum_subquery
+from users import stamps
+from users.autocomplete import autocomplete_index
+from users.birthdays import (get_birthday_list_key, get_birthday_today,
+                             get_seconds_until_midnight)
 from users.models import CustomUser
+from users.short_info import get_short_info_key
 
-from .mixins import CreateViewSet, UpdateListRetrieveViewSet
+from .cache import render_posts
+from .filters import PostSearchFilter, TrigramSearchFilter
+from .mixins import (CachedPostMixin, ConditionalGetMixin, CreateViewSet,
+                     LikeMixin, UpdateListRetrieveViewSet)
+from .pagination import FeedPagination, KeysetPagination, ThroughUserPagination
 from .permissions import IsAuthorOrReadOnly, IsUserOrReadOnly
 from .serializers import (AddressBookSerializer, BirthdaySerializer,
                           ChangePasswordSerializer, CommentSerializer,
                           CreateCustomUserSerializer, GroupSerializer,
                           PostSerializer, ResponseCreateCustomUserSerializer,
-                          ShortInfoSerializer, UserSerializer,
+                          ShortInfoSerializer, SubscribeSerializer,
+                          UploadSerializer, UserAutocompleteSerializer,
+                          UserSerializer, UserShortInfoSerializer,
                           UserUpdateSerializer)
-from .utils import del_files, del_images
+from .utils import (full_response_requested, get_query_param_set,
+                    parse_content_range)
 
 
-class UserPostsViewSet(viewsets.ModelViewSet):
+class UserPostsViewSet(CachedPostMixin, viewsets.ModelViewSet):
     serializer_class = PostSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = FeedPagination
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -45,51 +63,42 @@ class UserPostsViewSet(viewsets.ModelViewSet):
         return Post.objects.filter(author=user)
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(
+    ConditionalGetMixin, CachedPostMixin, LikeMixin, viewsets.ModelViewSet
+):
     """Добавление, изменение и удаление постов. Получение списка постов."""
 
-    queryset = Post.objects.all().prefetch_related('comments')
     serializer_class = PostSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = FeedPagination
+    filter_backends = [PostSearchFilter]
+    like_model = Post
+    etag_collections = (stamps.POSTS, stamps.USERS)
+
+    def get_queryset(self):
+        return Post.objects.all()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-    def perform_destroy(self, instance):
-        del_images(instance)
-        del_files(instance)
-        super().perform_destroy(instance)
 
-    @action(
-        url_path='like',
-        methods=('POST',),
-        detail=True,
-    )
-    def set_like(self, request, pk):
-        """Лайкнуть пост, отменить лайк."""
-        post = get_object_or_404(Post, id=pk)
-        post.likes.add(request.user)
-        serializer = PostSerializer(post)
-        return Response(
-            data=serializer.data, status=status.HTTP_201_CREATED
-        )
+class FeedView(CachedPostMixin, ListAPIView):
+    """Персональная лента: посты групп, на которые подписан пользователь."""
 
-    @set_like.mapping.delete
-    def delete_like(self, request, pk):
-        post = get_object_or_404(Post, id=pk)
-        post.likes.remove(request.user)
-        serializer = PostSerializer(post)
-        return Response(
-            data=serializer.data, status=status.HTTP_200_OK
-        )
+    serializer_class = PostSerializer
+    pagination_class = KeysetPagination
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Post.objects.none()
+        return get_home_feed(self.request.user)
 
 
-class CommentsViewSet(ModelViewSet):
-    queryset = Comment.objects.all().select_related(
-        'author', 'post').prefetch_related('like')
+class CommentsViewSet(LikeMixin, ModelViewSet):
     serializer_class = CommentSerializer
-    pagination_class = None
+    pagination_class = KeysetPagination
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
+    like_model = Comment
 
     def get_news(self):
         return get_object_or_404(Post, pk=self.kwargs.get('posts_id'))
@@ -97,32 +106,18 @@ class CommentsViewSet(ModelViewSet):
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Comment.objects.none()
-        return self.get_news().comments.all().select_related(
-            'author', 'post').prefetch_related('like')
+        return self.get_news().comments.with_related(self.request.user)
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, post=self.get_news())
-
-    @action(
-        url_path='like',
-        methods=('POST',),
-        detail=True,
-    )
-    def set_like(self, request, *args, **kwargs):
-        comment = get_object_or_404(Comment, id=self.kwargs['pk'])
-        comment.like.add(request.user)
-        return Response(
-            CommentSerializer(comment).data, status=status.HTTP_201_CREATED
-        )
+        post = self.get_news()
+        serializer.save(author=self.request.user, post=post)
+        post.change_comments_count(1)
 
-    @set_like.mapping.delete
-    def delete_like(self, request, *args, **kwargs):
-        comment = get_object_or_404(Comment, id=self.kwargs['pk'])
-        comment.like.remove(request.user)
-        serializer = CommentSerializer(comment)
-        return Response(
-            data=serializer.data, status=status.HTTP_200_OK
-        )
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        instance.post.change_comments_count(-1)
 
 
 class ChangePasswordView(CreateAPIView):
@@ -162,15 +157,42 @@ class ChangePasswordView(CreateAPIView):
                         status=status.HTTP_400_BAD_REQUEST)
 
 
-class UsersViewSet(UpdateListRetrieveViewSet):
+class UsersViewSet(ConditionalGetMixin, UpdateListRetrieveViewSet):
     """Users view."""
 
     actions_list = ['PATCH']
-    queryset = CustomUser.objects.all().prefetch_related('followings')
     permission_classes = (IsAuthenticated,)
     pagination_class = LimitOffsetPagination
     lookup_field = 'pk'
 
+    def get_expand(self):
+        return get_query_param_set(
+            self.request, UserSerializer.expand_query_param
+        )
+
+    def get_queryset(self):
+        """Вложенные коллекции загружаются, только если их раскрыли."""
+        lookups = {
+            'followings': 'followings',
+            'posts': Prefetch(
+                'posts',
+                queryset=Post.objects.with_related(self.request.user),
+            ),
+        }
+        return CustomUser.objects.prefetch_related(*(
+            lookup for name, lookup in lookups.items()
+            if name in self.get_expand()
+        ))
+
+    def get_etag_collections(self):
+        expand = self.get_expand()
+        return (
+            stamps.USERS,
+            *((stamps.POSTS,) if 'posts' in expand else ()),
+            *((stamps.GROUPS, stamps.FOLLOWERS)
+              if 'followings' in expand else ()),
+        )
+
     def get_serializer_class(self):
         if self.request.method in self.actions_list:
             return UserUpdateSerializer
@@ -189,6 +211,32 @@ class UsersViewSet(UpdateListRetrieveViewSet):
         detail=False
     )
     def me(self, request):
+        return self.conditional_get(self.get_me_response, request)
+
+    @swagger_auto_schema(
+        manual_parameters=[openapi.Parameter(
+            'prefix', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+            description='Начало имени, фамилии, отчества или email.',
+        )],
+        responses={200: UserAutocompleteSerializer(many=True)},
+    )
+    @action(
+        methods=('GET',),
+        pagination_class=None,
+        detail=False
+    )
+    def autocomplete(self, request):
+        """Коллеги по началу имени из индекса в памяти, без запросов к БД."""
+        users = autocomplete_index.search(
+            request.query_params.get('prefix', ''),
+            settings.AUTOCOMPLETE_LIMIT,
+        )
+        serializer = UserAutocompleteSerializer(
+            users, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    def get_me_response(self, request):
         user_instance = self.request.user
         serializer = self.get_serializer(user_instance)
         return Response(serializer.data, status.HTTP_200_OK)
@@ -206,32 +254,108 @@ class CreateUsersViewSet(CreateViewSet):
         return super().create(request, *args, **kwargs)
 
 
-class GroupViewSet(ReadOnlyModelViewSet):
-    queryset = Group.objects.all()
+class GroupViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     serializer_class = GroupSerializer
+    etag_collections = (
+        stamps.GROUPS, stamps.FOLLOWERS, stamps.POSTS, stamps.USERS
+    )
     pagination_class = LimitOffsetPagination
     filter_backends = [filters.SearchFilter]
     search_fields = ('title',)
 
+    def get_expand(self):
+        return get_query_param_set(
+            self.request, GroupSerializer.expand_query_param
+        )
+
+    def get_queryset(self):
+        """
+        Счётчики и подписка — подзапросами в запросе страницы,
+        вложенные списки загружаются, только если их раскрыли.
+        """
+        lookups = {
+            'followers': 'followers',
+            'posts_group': Prefetch(
+                'posts_group',
+                queryset=Post.objects.with_related(self.request.user),
+            ),
+        }
+        return Group.objects.select_related('author').with_counts(
+            self.request.user
+        ).prefetch_related(*(
+            lookup for name, lookup in lookups.items()
+            if name in self.get_expand()
+        ))
+
+    @swagger_auto_schema(responses={200: PostSerializer(many=True)})
+    @action(
+        url_path='posts',
+        methods=('GET',),
+        detail=True,
+        pagination_class=KeysetPagination,
+    )
+    def posts(self, request, pk):
+        """Посты группы, постранично по курсору."""
+        group = get_object_or_404(Group.objects.only('id'), id=pk)
+        page = self.paginate_queryset(
+            group.posts_group.only(*CachedPostMixin.cache_fields)
+        )
+        return self.get_paginated_response(
+            render_posts(page, self.get_serializer_context())
+        )
+
+    @swagger_auto_schema(responses={200: UserShortInfoSerializer(many=True)})
+    @action(
+        url_path='followers',
+        methods=('GET',),
+        detail=True,
+        pagination_class=ThroughUserPagination,
+    )
+    def followers(self, request, pk):
+        """Подписчики группы, постранично по курсору."""
+        group = get_object_or_404(Group.objects.only('id'), id=pk)
+        through, lookup = group.get_follower_relation()
+        page = self.paginate_queryset(
+            through.objects.filter(**lookup).select_related('customuser')
+        )
+        serializer = UserShortInfoSerializer(
+            [follower.customuser for follower in page],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(
         url_path='subscribe',
         methods=('POST',),
         detail=True,
     )
     def set_subscribe(self, request, pk):
-        group = get_object_or_404(Group, id=pk)
-        group.followers.add(request.user)
-        return Response(
-            GroupSerializer(group).data, status=status.HTTP_201_CREATED
+        group = get_object_or_404(Group.objects.only('id'), id=pk)
+        if group.add_follower(request.user):
+            follow_groups(request.user.pk, (group.pk,))
+        return self.get_subscribe_response(
+            group, True, status.HTTP_201_CREATED
         )
 
     @set_subscribe.mapping.delete
     def delete_subscribe(self, request, pk):
-        group = get_object_or_404(Group, id=pk)
-        group.followers.remove(request.user)
-        return Response(
-            GroupSerializer(group).data, status=status.HTTP_200_OK
-        )
+        group = get_object_or_404(Group.objects.only('id'), id=pk)
+        if group.remove_follower(request.user):
+            unfollow_groups(request.user.pk, (group.pk,))
+        return self.get_subscribe_response(group, False, status.HTTP_200_OK)
+
+    def get_subscribe_response(self, group, subscribed, status):
+        if full_response_requested(self.request):
+            instance = self.get_queryset().get(pk=group.pk)
+            data = self.get_serializer(instance).data
+        else:
+            data = SubscribeSerializer({
+                'id': group.pk,
+                'subscribed': subscribed,
+                'followers_count': group.get_followers_count(),
+            }).data
+        return Response(data, status=status)
 
 
 class ShortInfoView(viewsets.ReadOnlyModelViewSet):
@@ -243,10 +367,39 @@ class ShortInfoView(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user_id = self.kwargs.get("user_id")
         return CustomUser.objects.filter(id=user_id).annotate(
-            posts_count=Value(
-                Post.objects.filter(author_id=user_id).count(),
-                output_field=IntegerField())
+            posts_count=count_subquery(Post, 'author'),
+            comments_count=count_subquery(Comment, 'author'),
+            likes_received=(
+                sum_subquery(Post, 'author', 'likes_count')
+                + sum_subquery(Comment, 'author', 'likes_count')
+            ),
+        )
+
+    def get_list_data(self):
+        """
+        Выборка из одного пользователя пагинируется списком,
+        без отдельного COUNT.
+        """
+        page = self.paginate_queryset(
+            list(self.filter_queryset(self.get_queryset()))
         )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data).data
+
+    def list(self, request, *args, **kwargs):
+        """
+        Карточка пользователя кэшируется на SHORT_INFO_CACHE_TIMEOUT.
+        Запросы с параметрами (?fields=, пагинация) кэш не используют:
+        сигналы сбрасывают только ключ карточки без параметров.
+        """
+        if request.query_params:
+            return Response(self.get_list_data())
+        key = get_short_info_key(self.kwargs.get('user_id'))
+        data = cache.get(key)
+        if data is None:
+            data = self.get_list_data()
+            cache.set(key, data, settings.SHORT_INFO_CACHE_TIMEOUT)
+        return Response(data)
 
 
 class BirthdayList(ListAPIView):
@@ -255,31 +408,103 @@ class BirthdayList(ListAPIView):
     pagination_class = None
 
     def get_queryset(self):
-        today = dt.datetime.today().date()
-        max_day = today + dt.timedelta(days=3)
-        if max_day.month != today.month:
-            return (CustomUser.objects.filter(
-                Q(birthday_date__month=max_day.month,
-                  birthday_date__day__lte=max_day.day)
-                | (Q(birthday_date__month=today.month,
-                   birthday_date__day__gte=today.day))
-            )).order_by('birthday_date__month', 'birthday_date__day')
-        return (CustomUser.objects.filter(
-            Q(birthday_date__month=today.month,
-              birthday_date__day__lte=max_day.day,
-              birthday_date__day__gte=today.day)
-        )).order_by('birthday_date__month', 'birthday_date__day')
-
-
-class AddressBookView(ListAPIView):
+        return CustomUser.objects.upcoming_birthdays(
+            get_birthday_today(), settings.BIRTHDAY_WINDOW_DAYS
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Список одинаков для всех весь день и берётся из кэша."""
+        key = get_birthday_list_key(get_birthday_today())
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, get_seconds_until_midnight())
+        return Response(data)
+
+
+class AddressBookView(ConditionalGetMixin, ListAPIView):
     """Create address book view."""
 
     queryset = CustomUser.objects.all().order_by('last_name', 'id')
     serializer_class = AddressBookSerializer
+    etag_collections = (stamps.USERS,)
     permission_classes = (IsAuthenticated,)
     pagination_class = LimitOffsetPagination
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['last_name', 'job_title']
+    filter_backends = [TrigramSearchFilter]
+
+
+class UploadViewSet(
+    mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet
+):
+    """
+    Загрузка файлов для постов без base64.
+
+    POST с multipart-полем file загружает файл целиком. POST с JSON
+    {filename, size} начинает загрузку по частям: части отправляются
+    PUT с телом-байтами и заголовком Content-Range: bytes start-end/size.
+    GET показывает, сколько байт получено, — с этого места загрузку
+    можно продолжить после обрыва. Токен завершённой загрузки
+    передаётся в поле uploads поста.
+    """
+
+    serializer_class = UploadSerializer
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (JSONParser, MultiPartParser)
+    lookup_field = 'token'
+
+    def get_queryset(self):
+        queryset = Upload.objects.active().filter(
+            owner_id=self.request.user.pk
+        )
+        if self.action != 'update':
+            return queryset
+        # Части одной загрузки записываются по очереди.
+        return queryset.select_for_update()
+
+    def perform_create(self, serializer):
+        file = serializer.validated_data.pop('file', None)
+        upload = serializer.save(owner=self.request.user)
+        if file is not None:
+            write_chunk(upload, file, file.size)
+            self.check_file_type(upload)
+
+    @swagger_auto_schema(
+        request_body=no_body,
+        manual_parameters=[openapi.Parameter(
+            'Content-Range', openapi.IN_HEADER, type=openapi.TYPE_STRING,
+            required=True, description='bytes <start>-<end>/<size>',
+        )],
+        responses={200: UploadSerializer, 409: UploadSerializer},
+    )
+    def update(self, request, *args, **kwargs):
+        """Часть файла. При неверном start — 409 и текущий offset."""
+        with transaction.atomic():
+            upload = self.get_object()
+            content_range = parse_content_range(
+                request.headers.get('Content-Range')
+            )
+            if content_range is None or content_range[2] != upload.size:
+                raise serializers.ValidationError(
+                    {'Content-Range': _('Неверный диапазон байт.')}
+                )
+            start, end, _size = content_range
+            if start != upload.offset or request.stream is None:
+                return Response(
+                    self.get_serializer(upload).data,
+                    status=status.HTTP_409_CONFLICT,
+                )
+            write_chunk(upload, request.stream, end - start + 1)
+        self.check_file_type(upload)
+        return Response(self.get_serializer(upload).data)
+
+    @staticmethod
+    def check_file_type(upload):
+        if upload.offset == upload.size and not upload.extension:
+            discard_upload(upload)
+            raise serializers.ValidationError(
+                {'file': _('Недопустимый тип файла.')}
+            )
 
 
 class СhangedActionViewMixin(ActionViewMixin):
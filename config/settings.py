@@ -14,6 +14,66 @@ ROOT_URLCONF = 'config.urls'
 
 PAGINATION_LIMIT_IN_ADMIN_PANEL = 10
 
+COMMENTS_PREVIEW_SIZE = 3
+
+# Посты групп с большим числом подписчиков не раскладываются по лентам,
+# а подтягиваются при чтении ленты.
+FEED_FANOUT_LIMIT = 1000
+FEED_FANOUT_BATCH_SIZE = 500
+FEED_BACKFILL_SIZE = 100
+
+# Нечёткий поиск в адресной книге без pg_trgm (SQLite): минимальная доля
+# совпавших триграмм, предельное число результатов и наибольший срок
+# жизни индекса в памяти. На PostgreSQL порог задаёт настройка базы
+# pg_trgm.word_similarity_threshold (ALTER DATABASE ... SET).
+TRIGRAM_SIMILARITY_THRESHOLD = 0.5
+TRIGRAM_SEARCH_LIMIT = 500
+TRIGRAM_INDEX_REBUILD_INTERVAL = 3600
+
+# Сколько дней после сегодняшнего показывать в списке дней рождения
+# и в каком часовом поясе начинаются сутки (список кэшируется до полуночи).
+BIRTHDAY_WINDOW_DAYS = 3
+BIRTHDAY_TIMEZONE = getenv('BIRTHDAY_TIMEZONE', default='UTC')
+
+# Время жизни кэша карточки пользователя (users/short_info), в секундах.
+SHORT_INFO_CACHE_TIMEOUT = 60
+
+# Автодополнение коллег: размер выдачи и периодичность синхронизации
+# индекса в памяти процесса с БД (в секундах).
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_SYNC_INTERVAL = 60
+AUTOCOMPLETE_REBUILD_INTERVAL = 3600
+
+# Загрузка файлов по частям: каталог недокачанных файлов (общий для всех
+# процессов приложения), предельный размер файла в байтах и срок жизни
+# загрузки в часах. Просроченные загрузки недоступны в API, их записи
+# и временные файлы удаляет команда purge_uploads.
+UPLOADS_TEMP_DIR = getenv(
+    'UPLOADS_TEMP_DIR', default=path.join(BASE_DIR, 'uploads')
+)
+UPLOAD_MAX_SIZE = int(getenv('UPLOAD_MAX_SIZE', default=100 * 1024 * 1024))
+UPLOAD_EXPIRE_HOURS = int(getenv('UPLOAD_EXPIRE_HOURS', default=24))
+
+# Потоки для фоновых задач (уменьшенные копии изображений и т. п.),
+# 0 — выполнять сразу в потоке запроса.
+BACKGROUND_WORKERS = int(getenv('BACKGROUND_WORKERS', default=2))
+IMAGE_VARIANT_QUALITY = 80
+
+# Журнал запросов: доля запросов, для которых пишутся тела (ответы
+# с ошибкой пишутся всегда), предельный размер тела в байтах и поля,
+# значения которых скрываются.
+REQUEST_LOG_SAMPLE_RATE = float(getenv('REQUEST_LOG_SAMPLE_RATE', default=0.1))
+REQUEST_LOG_BODY_LIMIT = 2048
+REQUEST_LOG_REDACTED_FIELDS = (
+    'password', 'new_password', 'current_password', 're_new_password',
+    'token', 'auth_token', 'key', 'uid',
+)
+
+# Запросы к БД дольше SLOW_QUERY_THRESHOLD миллисекунд пишутся в журнал,
+# с SLOW_QUERY_EXPLAIN — вместе с планом (EXPLAIN) для SELECT.
+SLOW_QUERY_THRESHOLD = float(getenv('SLOW_QUERY_THRESHOLD', default=200))
+SLOW_QUERY_EXPLAIN = getenv('SLOW_QUERY_EXPLAIN') == 'True'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -29,6 +89,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -46,6 +107,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.slow_query_log.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -156,6 +218,30 @@ DJOSER = {
     },
 }
 
+# Отрендеренные посты хранятся под ключом post:<id>:<version>, устаревшие
+# версии вытесняются по TIMEOUT и MAX_ENTRIES.
+CACHES = {
+    'default': {
+        'BACKEND': getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': getenv('CACHE_LOCATION', default='default'),
+    },
+    'posts': {
+        'BACKEND': getenv(
+            'POSTS_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': getenv('POSTS_CACHE_LOCATION', default='posts'),
+        'TIMEOUT': int(getenv('POSTS_CACHE_TIMEOUT', default=600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(getenv('POSTS_CACHE_MAX_ENTRIES', default=5000)),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_URLS_REGEX = r'^/api/.*$'
 CORS_ALLOW_CREDENTIALS = True
@@ -176,11 +262,18 @@ LOGGING = {
 
     'handlers': {
         'file': {
-            'class': 'logging.handlers.RotatingFileHandler',
+            'class': 'api.log_handlers.QueueFileHandler',
             'formatter': 'main_format',
             'filename': 'logs/info.log',
-            'maxBytes': 1000000,
-            'backupCount': 5,
+            'max_bytes': 1000000,
+            'backup_count': 5,
+        },
+        'audit_file': {
+            'class': 'api.log_handlers.QueueFileHandler',
+            'formatter': 'main_format',
+            'filename': 'logs/audit.log',
+            'max_bytes': 1000000,
+            'backup_count': 5,
         },
     },
 
@@ -190,9 +283,14 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True
         },
-        'django.db.backends': {
+        'slow_queries': {
             'handlers': ['file'],
-            'level': 'DEBUG',
+            'level': 'WARNING',
+        },
+        # Создание, изменение и удаление постов, вложений и пользователей.
+        'audit': {
+            'handlers': ['audit_file'],
+            'level': getenv('AUDIT_LOG_LEVEL', default='INFO'),
         },
     },
 }
@@ -1,3 +1,5 @@
+from urllib.parse import urlsplit
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
@@ -6,9 +8,19 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework.permissions import AllowAny
 
+from posts.variants import VARIANTS_DIR
+from posts.views import image_variant
+
+MEDIA_PATH = urlsplit(settings.MEDIA_URL).path.lstrip('/')
+
 urlpatterns = [
     path('protected_admin00/', admin.site.urls),
     path('api/v1/', include('api.v1.urls')),
+    path(
+        f'{MEDIA_PATH}{VARIANTS_DIR}/<int:size>/<path:name>',
+        image_variant,
+        name='image-variant',
+    ),
 ]
 
 schema_view = get_schema_view(
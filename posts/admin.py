@@ -1,5 +1,5 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.db.models import Sum
 
 from config.settings import PAGINATION_LIMIT_IN_ADMIN_PANEL
 from posts.models import Image, Post, Comment, File, Group
@@ -63,19 +63,19 @@ class GroupAdmin(admin.ModelAdmin):
 
     @admin.display(description='Количество комментов')
     def get_comments_count(self, obj):
-        posts = obj.posts_group.all()
-        return Comment.objects.filter(post__in=posts).count()
+        posts = obj.posts_group.aggregate(count=Sum('comments_count'))
+        return posts['count'] or 0
 
     @admin.display(description='Количество лайков на постах')
     def get_posts_likes_count(self, obj):
-        posts_likes = obj.posts_group.aggregate(likes_count=Count('likes'))
-        return posts_likes['likes_count']
+        posts_likes = obj.posts_group.aggregate(count=Sum('likes_count'))
+        return posts_likes['count'] or 0
 
     @admin.display(description='Количество лайков на комментах')
     def get_comments_likes_count(self, obj):
-        comments = Comment.objects.filter(post__in=obj.posts_group.all())
-        comments_likes = comments.aggregate(likes_count=Count('like'))
-        return comments_likes['likes_count']
+        comments = Comment.objects.filter(post__group=obj)
+        comments_likes = comments.aggregate(count=Sum('likes_count'))
+        return comments_likes['count'] or 0
 
 
 @admin.register(Post)
@@ -89,18 +89,18 @@ class PostAdmin(admin.ModelAdmin):
     list_display_links = ('text',)
     search_fields = ('text',)
     list_filter = ('pub_date', 'author')
-    ordering = ('-pub_date',)
+    ordering = ('-created_at',)
     inlines = (ImageInline, FileInline,)
     empty_value_display = '-пусто-'
     list_per_page = PAGINATION_LIMIT_IN_ADMIN_PANEL
 
     @admin.display(description='Количество лайков')
     def get_likes_count(self, obj):
-        return obj.likes.count()
+        return obj.likes_count
 
     @admin.display(description='Количество комментов')
     def get_comments_count(self, obj):
-        return obj.comments.count()
+        return obj.comments_count
 
 
 @admin.register(Comment)
@@ -111,10 +111,10 @@ class CommentsAdmin(admin.ModelAdmin):
     list_display_links = ('author',)
     search_fields = ('text',)
     list_filter = ('pub_date', 'author')
-    ordering = ('-pub_date',)
+    ordering = ('-created_at',)
     empty_value_display = '-пусто-'
     list_per_page = PAGINATION_LIMIT_IN_ADMIN_PANEL
 
     @admin.display(description='Количество лайков')
     def get_likes_count(self, obj):
-        return obj.like.count()
+        return obj.likes_count
@@ -0,0 +1,60 @@
+import logging
+from functools import partial
+from threading import Lock
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .tasks import submit
+from .variants import VARIANT_FORMATS, VARIANT_SIZES, get_variant_name
+
+logger = logging.getLogger('main')
+
+
+class FileDeleter:
+    """
+    Удаление файлов через storage после фиксации транзакции.
+
+    Файлы, удалённые за время работы одной фоновой задачи, копятся
+    в pending и удаляются следующей задачей одной пачкой. При откате
+    транзакции файлы не удаляются.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.pending = []
+
+    def schedule(self, field_file):
+        if field_file:
+            transaction.on_commit(
+                partial(self.add, field_file.storage, field_file.name)
+            )
+
+    def add(self, storage, name):
+        with self.lock:
+            self.pending.append((storage, name))
+            if len(self.pending) > 1:
+                # Пачку уже ждёт запланированная задача.
+                return
+        submit(self.flush)
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, []
+        for storage, name in batch:
+            try:
+                storage.delete(name)
+                if not storage.exists(name):
+                    delete_variants(name)
+            except Exception:
+                logger.exception('Не удалось удалить файл %s', name)
+
+
+def delete_variants(name):
+    """Уменьшенные копии изображения, оригинала которого больше нет."""
+    for size in VARIANT_SIZES:
+        for extension in VARIANT_FORMATS:
+            default_storage.delete(get_variant_name(name, size, extension))
+
+
+file_deleter = FileDeleter()
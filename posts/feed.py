@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Group, Post, TimelineEntry
+from .utils import count_subquery
+
+Follower = Group.followers.through
+
+
+def get_pull_group_ids(user):
+    """Группы пользователя, посты которых подтягиваются при чтении."""
+    return list(
+        Group.objects.filter(followers=user).annotate(
+            followers_total=count_subquery(Follower, 'group')
+        ).filter(
+            followers_total__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('id', flat=True)
+    )
+
+
+def get_home_feed(user):
+    """Персональная лента: разложенные посты и посты крупных групп."""
+    timeline = TimelineEntry.objects.filter(user=user).values('post_id')
+    condition = Q(id__in=timeline)
+    pull_group_ids = get_pull_group_ids(user)
+    if pull_group_ids:
+        condition |= Q(group_id__in=pull_group_ids)
+    return Post.objects.filter(condition)
+
+
+def add_to_timelines(user_ids, post_ids):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id)
+            for user_id in user_ids
+            for post_id in post_ids
+        ),
+        batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post_id, group_id):
+    """Раскладывает пост группы по лентам подписчиков батчами."""
+    followers = Follower.objects.filter(group_id=group_id)
+    if followers.count() > settings.FEED_FANOUT_LIMIT:
+        return
+    batch = []
+    for user_id in followers.values_list('customuser_id', flat=True).iterator(
+        chunk_size=settings.FEED_FANOUT_BATCH_SIZE
+    ):
+        batch.append(user_id)
+        if len(batch) == settings.FEED_FANOUT_BATCH_SIZE:
+            add_to_timelines(batch, (post_id,))
+            batch = []
+    if batch:
+        add_to_timelines(batch, (post_id,))
+
+
+def get_backfill_post_ids(group_ids):
+    """Последние FEED_BACKFILL_SIZE постов каждой из групп."""
+    return list(
+        Post.objects.latest_for_groups(
+            group_ids, settings.FEED_BACKFILL_SIZE
+        ).values_list('id', flat=True)
+    )
+
+
+def follow_groups(user_id, group_ids):
+    """Добавляет в ленту последние посты групп, на которые подписались."""
+    add_to_timelines((user_id,), get_backfill_post_ids(group_ids))
+
+
+def unfollow_groups(user_id, group_ids):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__group_id__in=group_ids
+    ).delete()
+
+
+def rebuild_timeline(user):
+    """Пересобирает ленту пользователя по текущим подпискам."""
+    TimelineEntry.objects.filter(user=user).delete()
+    group_ids = Group.objects.filter(followers=user).values_list(
+        'id', flat=True
+    )
+    follow_groups(user.pk, list(group_ids))
@@ -0,0 +1,234 @@
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from hashlib import blake2b
+from os import path
+from time import monotonic, sleep, time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import File, Group, Image, MediaBlob
+from posts.storage import ContentAddressedStorage
+from posts.variants import VARIANTS_DIR
+from users.models import CustomUser
+
+# Поля, файлы которых считаются используемыми.
+MEDIA_REFERENCES = (
+    (Image, 'image_link'),
+    (File, 'file_link'),
+    (Group, 'image_link'),
+    (CustomUser, 'photo'),
+)
+
+
+def get_key(name):
+    """8 байт хэша вместо строки: множество имён занимает меньше памяти."""
+    return blake2b(name.encode(), digest_size=8).digest()
+
+
+def get_original_name(name):
+    """Для копии изображения — имя оригинала, для остальных — само имя."""
+    parts = name.split('/', 2)
+    if len(parts) == 3 and parts[0] == VARIANTS_DIR:
+        return path.splitext(parts[2])[0]
+    return name
+
+
+def get_referenced_names(names):
+    """
+    Имена из names, на которые сейчас ссылаются записи в БД, в том
+    числе файлы хранилища с живыми ссылками в MediaBlob.
+    """
+    referenced = set(
+        MediaBlob.objects.filter(name__in=names, refcount__gt=0)
+        .values_list('name', flat=True)
+    )
+    for model, field in MEDIA_REFERENCES:
+        referenced.update(
+            model.objects.filter(**{f'{field}__in': names})
+            .values_list(field, flat=True)
+        )
+    return referenced
+
+
+def remove_file(root, name):
+    try:
+        os.remove(path.join(root, name))
+    except FileNotFoundError:
+        pass
+
+
+def scan_directory(root, relative, with_files=True):
+    """Файлы (имя, размер, mtime) и подкаталоги каталога relative."""
+    files, dirs = [], []
+    with os.scandir(path.join(root, relative)) as entries:
+        for entry in entries:
+            name = f'{relative}/{entry.name}' if relative else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(name)
+            elif with_files and entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                files.append((name, stat.st_size, stat.st_mtime))
+    return relative, files, dirs
+
+
+class RateLimiter:
+    """Не больше rate вызовов wait() в секунду, 0 — без ограничения."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = monotonic()
+        if self.next_at > now:
+            sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+class Command(BaseCommand):
+    help = (
+        'Находит в MEDIA_ROOT файлы, на которые не ссылаются изображения, '
+        'файлы постов, группы и фотографии пользователей. Без --delete '
+        'только выводит отчёт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Удалить найденные файлы.',
+        )
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Не трогать файлы, изменённые за последние N часов.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Количество потоков, читающих каталоги.',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help='Не больше N удалений в секунду, 0 — без ограничения.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с обработанными каталогами: при повторном запуске '
+                 'их файлы пропускаются.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Количество записей, читаемых из БД за один запрос.',
+        )
+
+    def load_references(self, batch_size):
+        referenced = {
+            get_key(name) for name in MediaBlob.objects.filter(
+                refcount__gt=0
+            ).values_list('name', flat=True).iterator(chunk_size=batch_size)
+        }
+        for model, field in MEDIA_REFERENCES:
+            names = model.objects.filter(
+                **{f'{field}__gt': ''}
+            ).values_list(field, flat=True).iterator(chunk_size=batch_size)
+            referenced.update(get_key(name) for name in names)
+        return referenced
+
+    @staticmethod
+    def load_checkpoint(checkpoint):
+        if not checkpoint or not path.exists(checkpoint):
+            return set()
+        with open(checkpoint) as lines:
+            return {line.rstrip('\n') for line in lines}
+
+    @staticmethod
+    def walk(root, workers, done):
+        """Каталоги MEDIA_ROOT и их файлы, каталоги читаются параллельно."""
+        with ThreadPoolExecutor(workers) as executor:
+            pending = {
+                executor.submit(scan_directory, root, '', '' not in done)
+            }
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    relative, files, dirs = future.result()
+                    pending.update(
+                        executor.submit(
+                            scan_directory, root, name, name not in done
+                        )
+                        for name in dirs
+                    )
+                    if relative not in done:
+                        yield relative, files
+
+    def collect(self, root, orphans, options, stats):
+        referenced = get_referenced_names(
+            {get_original_name(name) for name, _ in orphans}
+        )
+        for name, size in orphans:
+            if get_original_name(name) in referenced:
+                continue
+            stats['orphans'] += 1
+            stats['bytes'] += size
+            if options['verbosity'] >= 2:
+                self.stdout.write(name)
+            if options['delete']:
+                self.limiter.wait()
+                if self.delete(root, name, size):
+                    stats['deleted'] += 1
+
+    @staticmethod
+    def delete(root, name, size):
+        """
+        Удаляет файл. Файл хранилища удаляется под блокировкой строки
+        MediaBlob, если на него снова не сослались (тогда — False).
+        Если строки нет, создаётся строка-блокировка без ссылок:
+        ContentAddressedStorage._save с тем же содержимым дождётся
+        фиксации и запишет файл заново.
+        """
+        if not name.startswith(f'{ContentAddressedStorage.prefix}/'):
+            remove_file(root, name)
+            return True
+        with transaction.atomic():
+            blob, _ = MediaBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={'size': size, 'refcount': 0}
+            )
+            if blob.refcount > 0:
+                return False
+            remove_file(root, name)
+            blob.delete()
+        return True
+
+    def handle(self, *args, **options):
+        root = settings.MEDIA_ROOT
+        referenced = self.load_references(options['batch_size'])
+        done = self.load_checkpoint(options['checkpoint'])
+        deadline = time() - options['grace_hours'] * 3600
+        self.limiter = RateLimiter(options['rate'])
+        stats = Counter()
+        checkpoint = (
+            open(options['checkpoint'], 'a') if options['checkpoint']
+            else nullcontext()
+        )
+        with checkpoint:
+            for relative, files in self.walk(root, options['workers'], done):
+                stats['files'] += len(files)
+                orphans = [
+                    (name, size) for name, size, mtime in files
+                    if mtime < deadline
+                    and get_key(get_original_name(name)) not in referenced
+                ]
+                if orphans:
+                    self.collect(root, orphans, options, stats)
+                if options['checkpoint']:
+                    checkpoint.write(f'{relative}\n')
+                    checkpoint.flush()
+        self.stdout.write(
+            f'Проверено файлов — {stats["files"]}, без ссылок — '
+            f'{stats["orphans"]} ({stats["bytes"]} байт), '
+            f'удалено — {stats["deleted"]}.'
+        )
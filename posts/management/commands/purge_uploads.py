@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.uploads import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет загрузки, начатые больше UPLOAD_EXPIRE_HOURS часов назад, '
+        'и временные файлы, оставшиеся без загрузок.'
+    )
+
+    def handle(self, *args, **options):
+        uploads, files = purge_expired_uploads()
+        self.stdout.write(
+            f'Удалено загрузок — {uploads}, '
+            f'временных файлов без загрузок — {files}.'
+        )
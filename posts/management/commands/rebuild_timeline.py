@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.feed import rebuild_timeline
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает персональную ленту пользователей по подпискам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'users', nargs='*',
+            help='id или корпоративная почта пользователей.',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересобрать ленты всех пользователей.',
+        )
+
+    def get_users(self, options):
+        if options['all']:
+            return CustomUser.objects.all().iterator()
+        if not options['users']:
+            raise CommandError('Укажите пользователей или --all.')
+        users = []
+        for value in options['users']:
+            lookup = {'pk': value} if value.isdigit() else {'email': value}
+            try:
+                users.append(CustomUser.objects.get(**lookup))
+            except CustomUser.DoesNotExist:
+                raise CommandError(f'Пользователь {value} не найден.')
+        return users
+
+    def handle(self, *args, **options):
+        for user in self.get_users(options):
+            rebuild_timeline(user)
+            self.stdout.write(f'Лента пользователя {user} пересобрана.')
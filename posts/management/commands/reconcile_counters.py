@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Max, Q
+
+from posts.models import Comment, Post
+from posts.utils import count_subquery
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счётчики лайков и комментариев '
+        'с фактическими данными и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество записей, проверяемых за один запрос.',
+        )
+
+    def get_counters(self):
+        return (
+            (Post, {
+                'likes_count': count_subquery(Post.likes.through, 'post'),
+                'comments_count': count_subquery(Comment, 'post'),
+            }),
+            (Comment, {
+                'likes_count': count_subquery(
+                    Comment.like.through, 'comment'
+                ),
+            }),
+        )
+
+    def reconcile(self, model, counters, batch_size):
+        expected = {f'expected_{name}': value
+                    for name, value in counters.items()}
+        drift = Q()
+        for name in counters:
+            drift |= ~Q(**{name: F(f'expected_{name}')})
+        max_id = model.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        fixed = 0
+        for start in range(0, max_id + 1, batch_size):
+            drifted_ids = list(
+                model.objects.filter(
+                    id__gte=start, id__lt=start + batch_size
+                ).annotate(**expected).filter(drift).values_list(
+                    'id', flat=True
+                )
+            )
+            if drifted_ids:
+                fixed += model.objects.filter(
+                    id__in=drifted_ids
+                ).update(**counters)
+        return fixed
+
+    def handle(self, *args, **options):
+        for model, counters in self.get_counters():
+            fixed = self.reconcile(model, counters, options['batch_size'])
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'исправлено записей — {fixed}.'
+            )
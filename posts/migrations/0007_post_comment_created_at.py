@@ -0,0 +1,84 @@
+# Generated by Django 4.1 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_created_at(apps, schema_editor):
+    """
+    Заполняет created_at батчами по диапазонам id.
+
+    Точное время создания старых записей не сохранилось, ближайшее
+    приближение — время последнего сохранения (update_date).
+    """
+    for model_name in ('Post', 'Comment'):
+        model = apps.get_model('posts', model_name)
+        bounds = model.objects.aggregate(
+            min_id=models.Min('id'), max_id=models.Max('id')
+        )
+        if bounds['min_id'] is None:
+            continue
+        for start in range(
+            bounds['min_id'], bounds['max_id'] + 1, BATCH_SIZE
+        ):
+            model.objects.filter(
+                id__gte=start,
+                id__lt=start + BATCH_SIZE,
+                created_at__isnull=True,
+            ).update(created_at=models.F('update_date'))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('posts', '0006_post_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='created_at',
+            field=models.DateTimeField(null=True, verbose_name='Время публикации'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='created_at',
+            field=models.DateTimeField(null=True, verbose_name='Время публикации'),
+        ),
+        migrations.RunPython(
+            backfill_created_at, migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Время публикации'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Время публикации'),
+        ),
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ('created_at', 'id'), 'verbose_name': 'Комментарий', 'verbose_name_plural': 'Комментарии'},
+        ),
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ('-created_at', '-id'), 'verbose_name': 'Пост', 'verbose_name_plural': 'Посты'},
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_feed_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ),
+    ]
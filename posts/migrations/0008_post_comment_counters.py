@@ -0,0 +1,79 @@
+# Generated by Django 4.1 on 2026-10-18 17:30
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 1000
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(**{field: models.OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=models.Count('*'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    """Заполняет счётчики батчами по диапазонам id."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    counters = (
+        (Post, {
+            'likes_count': count_subquery(
+                Post._meta.get_field('likes').remote_field.through, 'post'
+            ),
+            'comments_count': count_subquery(Comment, 'post'),
+        }),
+        (Comment, {
+            'likes_count': count_subquery(
+                Comment._meta.get_field('like').remote_field.through,
+                'comment',
+            ),
+        }),
+    )
+    for model, values in counters:
+        bounds = model.objects.aggregate(
+            min_id=models.Min('id'), max_id=models.Max('id')
+        )
+        if bounds['min_id'] is None:
+            continue
+        for start in range(
+            bounds['min_id'], bounds['max_id'] + 1, BATCH_SIZE
+        ):
+            model.objects.filter(
+                id__gte=start, id__lt=start + BATCH_SIZE
+            ).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('posts', '0007_post_comment_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество лайков'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество лайков'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
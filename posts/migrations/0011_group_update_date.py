@@ -0,0 +1,20 @@
+# Generated by Django 4.1 on 2026-10-18 18:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='update_date',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее обновление'),
+            preserve_default=False,
+        ),
+    ]
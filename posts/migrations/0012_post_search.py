@@ -0,0 +1,132 @@
+# Generated by Django 4.1 on 2026-10-18 18:10
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+POSTGRES_VECTOR = (
+    "to_tsvector('russian', coalesce({text}, '')) "
+    "|| to_tsvector('english', coalesce({text}, ''))"
+)
+
+POSTGRES_FORWARD = (
+    'ALTER TABLE posts_post ADD COLUMN search_vector tsvector',
+    f'''
+    CREATE FUNCTION posts_post_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {POSTGRES_VECTOR.format(text='NEW.text')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER posts_post_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF text ON posts_post
+    FOR EACH ROW EXECUTE FUNCTION posts_post_search_vector_update()
+    ''',
+)
+
+POSTGRES_INDEX = (
+    'CREATE INDEX CONCURRENTLY posts_post_search_idx '
+    'ON posts_post USING GIN (search_vector)'
+)
+
+POSTGRES_BACKWARD = (
+    'DROP INDEX IF EXISTS posts_post_search_idx',
+    'DROP TRIGGER IF EXISTS posts_post_search_vector_trigger ON posts_post',
+    'DROP FUNCTION IF EXISTS posts_post_search_vector_update()',
+    'ALTER TABLE posts_post DROP COLUMN IF EXISTS search_vector',
+)
+
+# Внешняя таблица FTS5 хранит только индекс, текст читается из posts_post.
+# SQLite пересоздаёт таблицу при части изменений схемы и теряет триггеры:
+# такие миграции posts_post должны повторять SQLITE_FORWARD.
+SQLITE_FORWARD = (
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    ''',
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+)
+
+SQLITE_BACKWARD = (
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TABLE IF EXISTS posts_post_fts',
+)
+
+
+def execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def backfill_search_vector(schema_editor):
+    """Заполняет search_vector существующих постов батчами по id."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT min(id), max(id) FROM posts_post')
+        min_id, max_id = cursor.fetchone()
+        if min_id is None:
+            return
+        for start in range(min_id, max_id + 1, BATCH_SIZE):
+            cursor.execute(
+                'UPDATE posts_post SET search_vector = '
+                f'{POSTGRES_VECTOR.format(text="text")} '
+                'WHERE id >= %s AND id < %s',
+                (start, start + BATCH_SIZE),
+            )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        execute(schema_editor, POSTGRES_FORWARD)
+        backfill_search_vector(schema_editor)
+        execute(schema_editor, (POSTGRES_INDEX,))
+    elif vendor == 'sqlite':
+        execute(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        execute(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == 'sqlite':
+        execute(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('posts', '0011_group_update_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1 on 2026-10-18 18:30
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Имя файла')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Размер')),
+                ('refcount', models.PositiveIntegerField(default=1, verbose_name='Число ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время создания')),
+            ],
+            options={
+                'verbose_name': 'Файл хранилища',
+                'verbose_name_plural': 'Файлы хранилища',
+            },
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='file_link',
+            field=models.FileField(blank=True, null=True, storage=posts.storage.get_media_store, upload_to='posts/files/%Y/%m/%d', verbose_name='Файл'),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='image_link',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.get_media_store, upload_to='posts/images/%Y/%m/%d', verbose_name='Изображение'),
+        ),
+    ]
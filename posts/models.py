@@ -1,10 +1,22 @@
 import logging
+import uuid
+from datetime import timedelta
+from os import path
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 
 from users.models import CustomUser
+from users.stamps import FOLLOWERS, POSTS, touch
 
-logger = logging.getLogger('django.db.backends')
+from .storage import get_media_store
+from .utils import count_subquery
+
+logger = logging.getLogger('audit')
 
 LIMIT_CHARS = 25
 
@@ -12,10 +24,17 @@ LIMIT_CHARS = 25
 class AbstractBaseModel(models.Model):
     text = models.TextField('Текст', max_length=2000)
     pub_date = models.DateField('Дата создания', auto_now=True)
+    created_at = models.DateTimeField('Время публикации', auto_now_add=True)
     update_date = models.DateTimeField(
         verbose_name='Последнее обновление',
         auto_now=True,
     )
+    likes_count = models.PositiveIntegerField(
+        'Количество лайков', default=0, editable=False
+    )
+
+    likes_field = None
+    counter_fields = ('likes_count',)
 
     class Meta:
         abstract = True
@@ -23,11 +42,80 @@ class AbstractBaseModel(models.Model):
     def __str__(self):
         return self.text[:LIMIT_CHARS]
 
+    def save(
+        self, force_insert=False, force_update=False,
+        using=None, update_fields=None
+    ):
+        """
+        Счётчики меняются только через F-выражения, поэтому при
+        обновлении записи они не перезаписываются значениями из памяти.
+        """
+        if not self._state.adding and update_fields is None:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+
+    def get_like_relation(self):
+        """Промежуточная модель лайков и фильтр по этому объекту."""
+        field = self._meta.get_field(self.likes_field)
+        through = field.remote_field.through
+        return through, {f'{field.m2m_field_name()}_id': self.pk}
+
+    def change_likes_count(self, delta):
+        type(self).objects.filter(pk=self.pk).update(
+            likes_count=F('likes_count') + delta
+        )
+        self.likes_count += delta
+
+    @transaction.atomic
+    def add_like(self, user):
+        """Ставит лайк. Возвращает False, если лайк уже стоял."""
+        through, lookup = self.get_like_relation()
+        _, created = through.objects.get_or_create(
+            customuser_id=user.pk, **lookup
+        )
+        if created:
+            self.change_likes_count(1)
+        return created
+
+    @transaction.atomic
+    def remove_like(self, user):
+        """Снимает лайк. Возвращает False, если лайка не было."""
+        through, lookup = self.get_like_relation()
+        deleted, _ = through.objects.filter(
+            customuser_id=user.pk, **lookup
+        ).delete()
+        if deleted:
+            self.change_likes_count(-1)
+        return bool(deleted)
+
+
+class GroupQuerySet(models.QuerySet):
+
+    def with_counts(self, user=None):
+        """
+        Количество подписчиков и постов и подписка пользователя
+        подзапросами в том же запросе, что и выборка групп.
+        """
+        followers = Group.followers.through
+        return self.annotate(
+            followers_count=count_subquery(followers, 'group'),
+            posts_count=count_subquery(Post, 'group'),
+            is_subscribed=models.Exists(followers.objects.filter(
+                group=models.OuterRef('pk'),
+                customuser_id=getattr(user, 'pk', None),
+            )),
+        )
+
 
 class Group(models.Model):
     title = models.CharField('Название', max_length=50)
     description = models.CharField('Описание', max_length=1000)
     created_date = models.DateTimeField('Дата создания', auto_now_add=True)
+    update_date = models.DateTimeField('Последнее обновление', auto_now=True)
     resume = models.CharField('Резюме', max_length=35)
     author = models.ForeignKey(
         CustomUser,
@@ -49,6 +137,8 @@ class Group(models.Model):
         null=True,
     )
 
+    objects = GroupQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Группа'
         verbose_name_plural = 'Группы'
@@ -57,6 +147,112 @@ class Group(models.Model):
     def __str__(self):
         return self.title[:LIMIT_CHARS]
 
+    def get_follower_relation(self):
+        return Group.followers.through, {'group_id': self.pk}
+
+    def add_follower(self, user):
+        """Подписывает пользователя. False, если подписка уже была."""
+        through, lookup = self.get_follower_relation()
+        _, created = through.objects.get_or_create(
+            customuser_id=user.pk, **lookup
+        )
+        if created:
+            touch(FOLLOWERS)
+        return created
+
+    def remove_follower(self, user):
+        """Отписывает пользователя. False, если подписки не было."""
+        through, lookup = self.get_follower_relation()
+        deleted, _ = through.objects.filter(
+            customuser_id=user.pk, **lookup
+        ).delete()
+        if deleted:
+            touch(FOLLOWERS)
+        return bool(deleted)
+
+    def get_followers_count(self):
+        through, lookup = self.get_follower_relation()
+        return through.objects.filter(**lookup).count()
+
+
+class LikedByMeQuerySetMixin:
+
+    def with_liked_by(self, user):
+        """
+        Аннотация liked_by_me одним EXISTS-подзапросом на всю выборку.
+        """
+        field = self.model._meta.get_field(self.model.likes_field)
+        likes = field.remote_field.through.objects.filter(
+            **{field.m2m_field_name(): models.OuterRef('pk')},
+            customuser_id=getattr(user, 'pk', None),
+        )
+        return self.annotate(liked_by_me=models.Exists(likes))
+
+
+class CommentQuerySet(LikedByMeQuerySetMixin, models.QuerySet):
+
+    def with_related(self, user=None):
+        """Всё, что нужно CommentSerializer, без запросов на строку."""
+        return self.select_related('author').with_liked_by(user)
+
+    def latest_for_posts(self, post_ids, limit):
+        """
+        Последние limit комментариев каждого из постов одним запросом:
+        комментарии нумеруются оконной функцией внутри поста.
+        """
+        ranked = Comment.objects.filter(post_id__in=post_ids).annotate(
+            comment_rank=models.Window(
+                RowNumber(),
+                partition_by=F('post_id'),
+                order_by=(F('created_at').desc(), F('id').desc()),
+            )
+        ).values('id', 'comment_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE comment_rank <= %s',
+            (*params, limit),
+        ))
+
+
+class PostQuerySet(LikedByMeQuerySetMixin, models.QuerySet):
+
+    def update(self, **kwargs):
+        """Счётчики и версии постов меняются update(), это меняет ETag."""
+        touch(POSTS)
+        return super().update(**kwargs)
+
+    def bump_version(self):
+        """Помечает закэшированные представления постов устаревшими."""
+        return self.update(version=F('version') + 1)
+
+    def with_related(self, user=None):
+        """
+        Всё, что нужно PostSerializer, за фиксированное число запросов
+        независимо от количества постов. Превью комментариев
+        подгружает PostListSerializer.
+        """
+        return self.select_related('author').prefetch_related(
+            'images', 'files',
+        ).with_liked_by(user)
+
+    def latest_for_groups(self, group_ids, limit):
+        """
+        Последние limit постов каждой из групп одним запросом: посты
+        нумеруются оконной функцией внутри группы.
+        """
+        ranked = Post.objects.filter(group_id__in=group_ids).annotate(
+            group_rank=models.Window(
+                RowNumber(),
+                partition_by=F('group_id'),
+                order_by=(F('created_at').desc(), F('id').desc()),
+            )
+        ).values('id', 'group_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE group_rank <= %s',
+            (*params, limit),
+        ))
+
 
 class Post(AbstractBaseModel):
     """Модель поста."""
@@ -81,11 +277,27 @@ class Post(AbstractBaseModel):
         blank=True,
         null=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0, editable=False
+    )
+    version = models.PositiveIntegerField(
+        'Версия', default=1, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    likes_field = 'likes'
+    counter_fields = ('likes_count', 'comments_count', 'version')
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
-        ordering = ('-pub_date', '-id')
+        ordering = ('-created_at', '-id')
+        indexes = (
+            models.Index(
+                fields=('-created_at', '-id'), name='post_feed_idx'
+            ),
+        )
 
     def save(
         self, force_insert=False, force_update=False,
@@ -93,13 +305,28 @@ class Post(AbstractBaseModel):
     ):
         is_created = False
         if self.id:
-            logger.info(f'Обновление поста id#{self.id} - "{self.text[:50]}"')
+            logger.info('Обновление поста id#%s - "%.50s"', self.id, self.text)
         else:
-            logger.info(f'Создание поста - "{self.text[:50]}"')
+            logger.info('Создание поста - "%.50s"', self.text)
             is_created = True
         super().save(force_insert, force_update, using, update_fields)
         if is_created:
-            logger.info(f'Создан пост id#{self.id}')
+            logger.info('Создан пост id#%s', self.id)
+        else:
+            Post.objects.filter(pk=self.pk).bump_version()
+
+    def change_likes_count(self, delta):
+        Post.objects.filter(pk=self.pk).update(
+            likes_count=F('likes_count') + delta,
+            version=F('version') + 1,
+        )
+        self.likes_count += delta
+
+    def change_comments_count(self, delta):
+        Post.objects.filter(pk=self.pk).update(
+            comments_count=F('comments_count') + delta,
+            version=F('version') + 1,
+        )
 
 
 class Comment(AbstractBaseModel):
@@ -123,11 +350,55 @@ class Comment(AbstractBaseModel):
         blank=True
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    likes_field = 'like'
+
     class Meta:
-        ordering = ('pub_date', 'id')
+        ordering = ('created_at', 'id')
+        indexes = (
+            models.Index(
+                fields=('post', 'created_at', 'id'),
+                name='comment_post_created_idx',
+            ),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
+    def change_likes_count(self, delta):
+        """Лайки комментария видны в превью, поэтому меняют версию поста."""
+        super().change_likes_count(delta)
+        Post.objects.filter(comments=self.pk).bump_version()
+
+
+class TimelineEntry(models.Model):
+    """Пост группы в персональной ленте подписчика."""
+
+    user = models.ForeignKey(
+        CustomUser,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline_post'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user} — {self.post}'
+
 
 class Image(models.Model):
     """Модель для изображений к посту."""
@@ -141,6 +412,7 @@ class Image(models.Model):
     image_link = models.ImageField(
         verbose_name='Изображение',
         upload_to='posts/images/%Y/%m/%d',
+        storage=get_media_store,
         blank=True,
         null=True,
     )
@@ -157,14 +429,15 @@ class Image(models.Model):
         is_created = False
         if self.id:
             logger.info(
-                f'Обновление изображения id#{self.id} к посту "{self.post}"'
+                'Обновление изображения id#%s к посту id#%s',
+                self.id, self.post_id,
             )
         else:
-            logger.info(f'Создание изображения к посту "{self.post}"')
+            logger.info('Создание изображения к посту id#%s', self.post_id)
             is_created = True
         super().save(force_insert, force_update, using, update_fields)
         if is_created:
-            logger.info(f'Создано изображение id#{self.id}')
+            logger.info('Создано изображение id#%s', self.id)
 
 
 class File(models.Model):
@@ -179,6 +452,7 @@ class File(models.Model):
     file_link = models.FileField(
         verbose_name='Файл',
         upload_to='posts/files/%Y/%m/%d',
+        storage=get_media_store,
         blank=True,
         null=True,
     )
@@ -200,11 +474,105 @@ class File(models.Model):
         is_created = False
         if self.id:
             logger.info(
-                f'Обновление файла id#{self.id} к посту "{self.post}"'
+                'Обновление файла id#%s к посту id#%s', self.id, self.post_id
             )
         else:
-            logger.info(f'Создание файла к посту "{self.post}"')
+            logger.info('Создание файла к посту id#%s', self.post_id)
             is_created = True
         super().save(force_insert, force_update, using, update_fields)
         if is_created:
-            logger.info(f'Создан файл id#{self.id}')
+            logger.info('Создан файл id#%s', self.id)
+
+
+def get_upload_deadline():
+    """Загрузки, начатые раньше этого момента, просрочены."""
+    return timezone.now() - timedelta(hours=settings.UPLOAD_EXPIRE_HOURS)
+
+
+class UploadQuerySet(models.QuerySet):
+
+    def active(self):
+        return self.filter(created_at__gte=get_upload_deadline())
+
+
+class Upload(models.Model):
+    """
+    Файл, загружаемый по частям. Данные копятся во временном файле
+    в UPLOADS_TEMP_DIR, после загрузки файл по token прикрепляется
+    к посту.
+    """
+
+    token = models.UUIDField(
+        'Токен', default=uuid.uuid4, unique=True, editable=False
+    )
+    owner = models.ForeignKey(
+        CustomUser,
+        verbose_name='Владелец',
+        on_delete=models.CASCADE,
+        related_name='uploads',
+    )
+    filename = models.CharField('Имя файла', max_length=255)
+    size = models.PositiveBigIntegerField('Размер')
+    offset = models.PositiveBigIntegerField('Получено байт', default=0)
+    extension = models.CharField('Тип файла', max_length=10, blank=True)
+    created_at = models.DateTimeField('Время создания', auto_now_add=True)
+
+    objects = UploadQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Загрузка'
+        verbose_name_plural = 'Загрузки'
+
+    def __str__(self):
+        return self.filename[:LIMIT_CHARS]
+
+    @property
+    def is_complete(self):
+        """Получены все байты, тип файла определён и допустим."""
+        return self.offset == self.size and bool(self.extension)
+
+    @property
+    def is_expired(self):
+        return self.created_at < get_upload_deadline()
+
+    def get_temp_path(self):
+        return path.join(settings.UPLOADS_TEMP_DIR, f'{self.token.hex}.part')
+
+
+class MediaBlobQuerySet(models.QuerySet):
+
+    def add_reference(self, name, size):
+        blob, created = self.select_for_update().get_or_create(
+            name=name, defaults={'size': size}
+        )
+        if not created:
+            self.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+
+    def remove_reference(self, name):
+        """True, если на файл больше никто не ссылается."""
+        blob = self.select_for_update().filter(name=name).first()
+        if blob is None:
+            return True
+        if blob.refcount > 1:
+            self.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+            return False
+        blob.delete()
+        return True
+
+
+class MediaBlob(models.Model):
+    """Файл в ContentAddressedStorage и число ссылок на него."""
+
+    name = models.CharField('Имя файла', max_length=255, unique=True)
+    size = models.PositiveBigIntegerField('Размер')
+    refcount = models.PositiveIntegerField('Число ссылок', default=1)
+    created_at = models.DateTimeField('Время создания', auto_now_add=True)
+
+    objects = MediaBlobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Файл хранилища'
+        verbose_name_plural = 'Файлы хранилища'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,52 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+# Колонка search_vector, её триггер и индексы создаются миграцией
+# 0012_post_search и в модели Post не описаны.
+POSTGRES_QUERY = (
+    "websearch_to_tsquery('russian', %s) "
+    "|| websearch_to_tsquery('english', %s)"
+)
+SQLITE_TABLE = 'posts_post_fts'
+WORD_RE = re.compile(r'\w+')
+
+
+def get_sqlite_query(query):
+    """
+    Запрос FTS5 из слов поисковой строки: каждое слово в кавычках,
+    поэтому операторы и спецсимволы FTS5 от клиента не интерпретируются.
+    """
+    return ' '.join(f'"{word}"' for word in WORD_RE.findall(query))
+
+
+def search_posts(queryset, query):
+    """
+    Посты, подходящие под поисковую строку, с оценкой релевантности
+    search_rank (чем больше, тем выше в выдаче).
+    """
+    if connection.vendor == 'postgresql':
+        params = (query, query)
+        return queryset.annotate(search_rank=RawSQL(
+            f'ts_rank(posts_post.search_vector, {POSTGRES_QUERY})',
+            params,
+            output_field=FloatField(),
+        )).filter(RawSQL(
+            f'posts_post.search_vector @@ ({POSTGRES_QUERY})',
+            params,
+            output_field=BooleanField(),
+        ))
+    match = get_sqlite_query(query)
+    if not match:
+        return queryset.none()
+    return queryset.annotate(search_rank=RawSQL(
+        f'SELECT -rank FROM {SQLITE_TABLE} '
+        f'WHERE {SQLITE_TABLE} MATCH %s AND rowid = posts_post.id',
+        (match,),
+        output_field=FloatField(),
+    )).filter(id__in=RawSQL(
+        f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s',
+        (match,),
+    ))
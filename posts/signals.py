@@ -1,27 +1,141 @@
 import logging
+from functools import partial
 
-from django.db.models.signals import post_delete
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from .models import File, Post, Image
+from users.models import CustomUser
+from users.short_info import invalidate_short_info
+from users.stamps import FOLLOWERS, GROUPS, POSTS, touch
 
-logger = logging.getLogger('django.db.backends')
+from .cleanup import file_deleter
+from .feed import fan_out_post, follow_groups, unfollow_groups
+from .models import Comment, File, Group, Image, Post
+from .variants import schedule_variants
+
+logger = logging.getLogger('audit')
+
+# Отметки коллекций, которые меняют создание и удаление записей.
+COLLECTIONS = {Post: POSTS, Group: GROUPS}
+
+# Поля автора, которые входят в закэшированное представление поста.
+AUTHOR_CACHED_FIELDS = frozenset(
+    ('first_name', 'last_name', 'photo', 'is_staff')
+)
 
 
 @receiver(post_delete, sender=Post)
 def delete_post_log_handler(sender, instance, *args, **kwargs):
-    logger.info(f'Удаление поста id#{instance.id} - "{instance.text[:50]}"')
+    logger.info(
+        'Удаление поста id#%s - "%.50s"', instance.id, instance.text
+    )
 
 
 @receiver(post_delete, sender=Image)
 def delete_image_log_handler(sender, instance, *args, **kwargs):
     logger.info(
-        f'Удаление изображения id#{instance.id} к посту "{instance.post}"'
+        'Удаление изображения id#%s к посту id#%s',
+        instance.id, instance.post_id,
     )
 
 
 @receiver(post_delete, sender=File)
 def delete_file_log_handler(sender, instance, *args, **kwargs):
     logger.info(
-        f'Удаление файла id#{instance.id} к посту "{instance.post}"'
+        'Удаление файла id#%s к посту id#%s', instance.id, instance.post_id
+    )
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post_handler(sender, instance, created, *args, **kwargs):
+    if created and instance.group_id:
+        transaction.on_commit(
+            partial(fan_out_post, instance.pk, instance.group_id)
+        )
+
+
+@receiver(m2m_changed, sender=Group.followers.through)
+def followers_changed_handler(
+    sender, instance, action, reverse, pk_set, *args, **kwargs
+):
+    """Подписки, изменённые через group.followers (например, в админке)."""
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    handler = follow_groups if action == 'post_add' else unfollow_groups
+    if reverse:
+        handler(instance.pk, pk_set)
+    else:
+        for user_id in pk_set:
+            handler(user_id, (instance.pk,))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=File)
+@receiver(post_delete, sender=File)
+def bump_post_version_handler(sender, instance, *args, **kwargs):
+    """Комментарии и вложения входят в закэшированное представление."""
+    Post.objects.filter(pk=instance.post_id).bump_version()
+
+
+@receiver(post_save, sender=CustomUser)
+def author_changed_handler(sender, instance, created, update_fields,
+                           *args, **kwargs):
+    if created or (
+        update_fields is not None
+        and AUTHOR_CACHED_FIELDS.isdisjoint(update_fields)
+    ):
+        return
+    Post.objects.filter(
+        Q(author_id=instance.pk) | Q(comments__author_id=instance.pk)
+    ).bump_version()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def short_info_changed_handler(sender, instance, *args, **kwargs):
+    """Счётчики постов и комментариев в карточке автора."""
+    if kwargs.get('created', True):
+        transaction.on_commit(
+            partial(invalidate_short_info, instance.author_id)
+        )
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=CustomUser)
+def image_variants_handler(sender, instance, update_fields, *args, **kwargs):
+    """Уменьшенные копии новых изображений создаются заранее, в фоне."""
+    field = 'photo' if sender is CustomUser else 'image_link'
+    if update_fields is None or field in update_fields:
+        schedule_variants((getattr(instance, field).name,))
+
+
+@receiver(post_delete, sender=Image)
+@receiver(post_delete, sender=File)
+def delete_attachment_file_handler(sender, instance, *args, **kwargs):
+    """Файл вложения удаляется в фоне, если транзакция зафиксирована."""
+    file_deleter.schedule(
+        instance.image_link if sender is Image else instance.file_link
     )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def collection_changed_handler(sender, *args, **kwargs):
+    touch(COLLECTIONS[sender])
+
+
+@receiver(m2m_changed, sender=Group.followers.through)
+def followers_stamp_handler(sender, action, *args, **kwargs):
+    """Подписки, изменённые через group.followers (например, в админке)."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        touch(FOLLOWERS)
@@ -0,0 +1,78 @@
+import os
+from hashlib import sha256
+from os import path
+from tempfile import NamedTemporaryFile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище вложений, в котором имя файла — SHA-256 содержимого:
+    cas/ab/cd/<sha256>.<расширение>.
+
+    Одинаковые файлы хранятся один раз. Каждое сохранение добавляет
+    ссылку на файл в MediaBlob, delete() убирает ссылку и удаляет
+    файл, когда ссылок не осталось. Содержимое по имени не меняется,
+    поэтому ссылки на файлы можно кэшировать навсегда.
+    """
+
+    prefix = 'cas'
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым файла в _save().
+        return name
+
+    def get_hashed_name(self, digest, name):
+        extension = path.splitext(name)[1].lower()
+        return f'{self.prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def write_temp(self, content):
+        """Копирует content во временный файл, считая хэш по ходу."""
+        temp_dir = self.path(f'{self.prefix}/tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        digest = sha256()
+        size = 0
+        with NamedTemporaryFile(dir=temp_dir, delete=False) as temp:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                temp.write(chunk)
+                size += len(chunk)
+        return temp.name, digest.hexdigest(), size
+
+    def _save(self, name, content):
+        media_blobs = apps.get_model('posts', 'MediaBlob').objects
+        temp_path, digest, size = self.write_temp(content)
+        name = self.get_hashed_name(digest, name)
+        full_path = self.path(name)
+        try:
+            with transaction.atomic():
+                media_blobs.add_reference(name, size)
+                if not path.exists(full_path):
+                    os.makedirs(path.dirname(full_path), exist_ok=True)
+                    os.replace(temp_path, full_path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+                else:
+                    # Повторно используемый файл не должен выглядеть
+                    # старым для collect_media_garbage.
+                    os.utime(full_path)
+        finally:
+            if path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def delete(self, name):
+        media_blobs = apps.get_model('posts', 'MediaBlob').objects
+        with transaction.atomic():
+            if media_blobs.remove_reference(name):
+                super().delete(name)
+
+
+media_store = ContentAddressedStorage()
+
+
+def get_media_store():
+    return media_store
@@ -0,0 +1,48 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger('main')
+
+
+def run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s', func.__name__)
+    finally:
+        close_old_connections()
+
+
+class BackgroundPool:
+    """
+    Пул из BACKGROUND_WORKERS потоков для работы вне обработки
+    запроса. Потоки создаются при первой задаче. При
+    BACKGROUND_WORKERS = 0 задачи выполняются сразу, в этом потоке.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.executor = None
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=settings.BACKGROUND_WORKERS,
+                    thread_name_prefix='background',
+                )
+        return self.executor
+
+    def submit(self, func, *args):
+        if not settings.BACKGROUND_WORKERS:
+            run(func, *args)
+        else:
+            self.get_executor().submit(run, func, *args)
+
+
+background_pool = BackgroundPool()
+submit = background_pool.submit
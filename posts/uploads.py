@@ -0,0 +1,138 @@
+import os
+from os import path
+
+import filetype
+from django.conf import settings
+from django.core.files import File as StoredFile
+from django.db import transaction
+
+from .models import File, Image, Upload, get_upload_deadline
+from .variants import schedule_variants
+
+# Части читаются блоками, поэтому память не зависит от размера файла.
+BLOCK_SIZE = 64 * 1024
+# filetype определяет тип по сигнатуре в первых 8 КБ файла.
+SNIFF_SIZE = 8192
+IMAGE_EXTENSIONS = ('png', 'jpg', 'webp', 'gif', 'tif', 'bmp')
+ALLOWED_EXTENSIONS = (
+    'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'txt',
+    'pdf', 'rtf', 'zip', 'rar',
+    *IMAGE_EXTENSIONS,
+    'mp3', 'wav', 'mp4', 'mkv', 'webm', 'mov', 'avi', 'mpg',
+)
+# У текстовых файлов нет сигнатуры, их тип берётся из имени файла.
+TEXT_EXTENSIONS = ('txt',)
+
+
+def sniff_extension(upload):
+    """Тип загруженного файла по его началу, None — если недопустим."""
+    with open(upload.get_temp_path(), 'rb') as temp:
+        kind = filetype.guess(temp.read(SNIFF_SIZE))
+    if kind is None:
+        extension = path.splitext(upload.filename)[1].lstrip('.').lower()
+        return extension if extension in TEXT_EXTENSIONS else None
+    return kind.extension if kind.extension in ALLOWED_EXTENSIONS else None
+
+
+def write_chunk(upload, stream, length):
+    """
+    Записывает до length байт из stream с позиции upload.offset.
+
+    Остаток временного файла после offset (от оборванной попытки)
+    перезаписывается. Когда получен последний байт, определяется
+    тип файла. Возвращает число записанных байт.
+    """
+    os.makedirs(settings.UPLOADS_TEMP_DIR, exist_ok=True)
+    temp_path = upload.get_temp_path()
+    written = 0
+    with open(temp_path, 'r+b' if path.exists(temp_path) else 'wb') as temp:
+        temp.seek(upload.offset)
+        temp.truncate()
+        while written < length:
+            block = stream.read(min(BLOCK_SIZE, length - written))
+            if not block:
+                break
+            temp.write(block)
+            written += len(block)
+    upload.offset += written
+    if upload.offset == upload.size:
+        upload.extension = sniff_extension(upload) or ''
+    upload.save(update_fields=('offset', 'extension'))
+    return written
+
+
+def remove_temp_files(temp_paths):
+    for temp_path in temp_paths:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+
+def remove_stale_temp_files(deadline):
+    """
+    Временные файлы, которые не менялись с deadline. Запись загрузки
+    создаётся раньше первой записи в файл, поэтому у таких файлов
+    загрузки либо уже нет, либо она просрочена.
+    """
+    if not path.isdir(settings.UPLOADS_TEMP_DIR):
+        return 0
+    with os.scandir(settings.UPLOADS_TEMP_DIR) as entries:
+        stale = [
+            entry.path for entry in entries
+            if entry.name.endswith('.part') and entry.is_file()
+            and entry.stat().st_mtime < deadline.timestamp()
+        ]
+    remove_temp_files(stale)
+    return len(stale)
+
+
+def purge_expired_uploads():
+    """
+    Удаляет просроченные загрузки с их временными файлами и временные
+    файлы, оставшиеся без загрузок. Возвращает число удалённых
+    загрузок и файлов.
+    """
+    deadline = get_upload_deadline()
+    with transaction.atomic():
+        uploads = list(
+            Upload.objects.filter(created_at__lt=deadline)
+            .select_for_update(skip_locked=True)
+        )
+        Upload.objects.filter(
+            pk__in=[upload.pk for upload in uploads]
+        ).delete()
+    remove_temp_files(upload.get_temp_path() for upload in uploads)
+    return len(uploads), remove_stale_temp_files(deadline)
+
+
+def discard_upload(upload):
+    """Удаляет загрузку вместе с временным файлом."""
+    remove_temp_files((upload.get_temp_path(),))
+    upload.delete()
+
+
+def attach_uploads(post, uploads):
+    """
+    Переносит завершённые загрузки в хранилище и прикрепляет их
+    к посту: изображения — как Image, остальное — как File.
+    Временные файлы удаляются после фиксации транзакции.
+    """
+    images, files = [], []
+    for upload in uploads:
+        name = f'{path.splitext(upload.filename)[0]}.{upload.extension}'
+        with open(upload.get_temp_path(), 'rb') as temp:
+            if upload.extension in IMAGE_EXTENSIONS:
+                image = Image(post=post)
+                image.image_link.save(name, StoredFile(temp), save=False)
+                images.append(image)
+            else:
+                file = File(post=post, file_title=upload.filename[:100])
+                file.file_link.save(name, StoredFile(temp), save=False)
+                files.append(file)
+    Image.objects.bulk_create(images)
+    File.objects.bulk_create(files)
+    schedule_variants(image.image_link.name for image in images)
+    temp_paths = [upload.get_temp_path() for upload in uploads]
+    Upload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+    transaction.on_commit(lambda: remove_temp_files(temp_paths))
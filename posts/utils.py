@@ -0,0 +1,30 @@
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    """Количество строк model, ссылающихся на внешний объект по field."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('*'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def sum_subquery(model, field, sum_field):
+    """Сумма sum_field строк model, ссылающихся на внешний объект по field."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Sum(sum_field))
+            .values('total')
+        ),
+        0,
+    )
@@ -0,0 +1,103 @@
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from .tasks import submit
+
+# Уменьшенные копии лежат рядом с оригиналами в хранилище:
+# variants/<размер>/<путь оригинала>.<формат>.
+VARIANTS_DIR = 'variants'
+VARIANT_SIZES = (64, 256, 1024)
+# WebP и JPEG для клиентов без поддержки WebP.
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+VARIANT_CONTENT_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+
+
+def get_variant_name(name, size, extension):
+    return f'{VARIANTS_DIR}/{size}/{name}.{extension}'
+
+
+def get_variant_urls(name):
+    """Ссылки на копии изображения name: {размер: {формат: url}}."""
+    return {
+        str(size): {
+            extension: default_storage.url(
+                get_variant_name(name, size, extension)
+            )
+            for extension in VARIANT_FORMATS
+        }
+        for size in VARIANT_SIZES
+    }
+
+
+def open_original(name):
+    with default_storage.open(name) as original:
+        image = PILImage.open(original)
+        image.load()
+    return ImageOps.exif_transpose(image)
+
+
+def render_variant(image, size, extension):
+    """Копия, вписанная в квадрат size × size, без увеличения."""
+    variant = image.copy()
+    variant.thumbnail((size, size))
+    mode = 'RGB' if extension == 'jpg' else 'RGBA'
+    if variant.mode not in ('RGB', mode):
+        variant = variant.convert(mode)
+    buffer = BytesIO()
+    variant.save(
+        buffer, VARIANT_FORMATS[extension],
+        quality=settings.IMAGE_VARIANT_QUALITY,
+    )
+    return ContentFile(buffer.getvalue())
+
+
+def save_variant(image, name, size, extension):
+    variant_name = get_variant_name(name, size, extension)
+    if default_storage.exists(variant_name):
+        return variant_name
+    saved = default_storage.save(
+        variant_name, render_variant(image, size, extension)
+    )
+    if saved != variant_name:
+        # Эту же копию одновременно создал другой поток или процесс.
+        default_storage.delete(saved)
+    return variant_name
+
+
+def generate_variants(name, variants=None):
+    """
+    Создаёт недостающие копии изображения name, по умолчанию — все
+    сочетания VARIANT_SIZES и VARIANT_FORMATS. Оригинал читается
+    один раз. Возвращает имена копий.
+    """
+    if variants is None:
+        variants = [
+            (size, extension)
+            for size in VARIANT_SIZES for extension in VARIANT_FORMATS
+        ]
+    missing = [
+        (size, extension) for size, extension in variants
+        if not default_storage.exists(get_variant_name(name, size, extension))
+    ]
+    if missing:
+        image = open_original(name)
+        for size, extension in missing:
+            save_variant(image, name, size, extension)
+    return [
+        get_variant_name(name, size, extension)
+        for size, extension in variants
+    ]
+
+
+def schedule_variants(names):
+    """Копии изображений создаются в фоне после фиксации транзакции."""
+    for name in names:
+        if name:
+            transaction.on_commit(partial(submit, generate_variants, name))
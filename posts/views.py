@@ -0,0 +1,36 @@
+from os import path
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from PIL import Image as PILImage
+
+from .tasks import submit
+from .variants import (VARIANT_CONTENT_TYPES, VARIANT_FORMATS, VARIANT_SIZES,
+                       generate_variants)
+
+
+def image_variant(request, size, name):
+    """
+    Копия изображения, которой ещё нет в хранилище.
+
+    nginx отдаёт готовые копии сам и обращается сюда только при
+    промахе: запрошенная копия создаётся сразу, остальные — в фоне.
+    """
+    original, extension = path.splitext(name)
+    extension = extension.lstrip('.')
+    if size not in VARIANT_SIZES or extension not in VARIANT_FORMATS:
+        raise Http404
+    try:
+        if not default_storage.exists(original):
+            raise Http404
+        variant_name, = generate_variants(original, ((size, extension),))
+    except (
+        OSError, PILImage.DecompressionBombError, SuspiciousFileOperation
+    ):
+        raise Http404
+    submit(generate_variants, original)
+    return FileResponse(
+        default_storage.open(variant_name),
+        content_type=VARIANT_CONTENT_TYPES[extension],
+    )
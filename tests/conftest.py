@@ -1,4 +1,17 @@
+import pytest
+from django.core.cache import caches
+
+from users.autocomplete import autocomplete_index
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Кэши в памяти процесса не должны переживать тест."""
+    for cache in caches.all():
+        cache.clear()
+    autocomplete_index.clear()
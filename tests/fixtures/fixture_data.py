@@ -1,6 +1,6 @@
 import pytest
 
-from posts.models import Post
+from posts.models import Group, Post
 
 
 @pytest.fixture
@@ -19,3 +19,13 @@ def post_liked(authenticated_user):
     )
     post_liked.users_like.set([authenticated_user])
     return post_liked
+
+
+@pytest.fixture
+def group_1(authenticated_user):
+    return Group.objects.create(
+        title='Первая группа',
+        description='Описание группы',
+        resume='Резюме группы',
+        author=authenticated_user,
+    )
@@ -2,6 +2,13 @@ import pytest
 from rest_framework import status
 import datetime as dt
 
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from users.models import CustomUser
+
 pytestmark = pytest.mark.django_db
 
 
@@ -121,3 +128,85 @@ class TestBirthday:
             ) == dt.datetime.strptime(
                 user1.birthday_date, '%Y-%m-%d'
             ).strftime('%d %B')
+
+    def test_upcoming_birthdays_wrap_around_new_year(self, new_user_factory):
+        for email, birthday in (
+            ('jan1@mail.com', '1990-01-01'),
+            ('dec30@mail.com', '1985-12-30'),
+            ('jan5@mail.com', '1992-01-05'),
+            ('dec20@mail.com', '1980-12-20'),
+        ):
+            new_user_factory(
+                email=email, password='password', birthday_date=birthday
+            )
+
+        users = CustomUser.objects.upcoming_birthdays(
+            dt.date(2025, 12, 29), 3
+        )
+        assert [user.email for user in users] == [
+            'dec30@mail.com', 'jan1@mail.com'
+        ], 'Окно дней рождения должно переходить через Новый год.'
+
+    def test_birthday_key_follows_birthday_date(self, new_user_factory):
+        user = new_user_factory(
+            email='user@mail.com', password='password',
+            birthday_date='1992-02-29',
+        )
+        assert CustomUser.objects.upcoming_birthdays(
+            dt.date(2025, 2, 28), 1
+        ).get() == user, '29 февраля должно попадать в окно 28.02–01.03.'
+
+        user.birthday_date = dt.date(1992, 7, 15)
+        user.save(update_fields=('birthday_date',))
+        user.refresh_from_db()
+        assert user.birthday_key == 715
+
+    @pytest.mark.django_db(transaction=True)
+    def test_birthday_list_cached_until_change(
+        self, authenticated_user_factory, new_user_factory, client,
+    ):
+        user = authenticated_user_factory(
+            email='user1@mail.com', password='password',
+            birthday_date=dt.date.today().strftime('%Y-%m-%d'),
+        )
+        headers = {'HTTP_AUTHORIZATION': f'Token {user.auth_token.key}'}
+        assert len(client.get(self.path, **headers).json()) == 1
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get(self.path, **headers)
+        assert not any(
+            'ORDER BY CASE' in query['sql'] for query in queries
+        ), 'Повторный запрос списка должен читаться из кэша.'
+
+        new_user_factory(
+            email='user2@mail.com', password='password',
+            birthday_date=dt.date.today().strftime('%Y-%m-%d'),
+        )
+        assert len(client.get(self.path, **headers).json()) == 2, (
+            'Новый день рождения должен сбрасывать кэш списка.'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_birthday_list_invalidated_by_other_process(
+        self, authenticated_user_factory, new_user_factory, client,
+    ):
+        user = authenticated_user_factory(
+            email='user1@mail.com', password='password',
+            birthday_date=dt.date.today().strftime('%Y-%m-%d'),
+        )
+        headers = {'HTTP_AUTHORIZATION': f'Token {user.auth_token.key}'}
+        assert len(client.get(self.path, **headers).json()) == 1
+
+        # У другого процесса приложения свой кэш в памяти.
+        caches = {
+            **settings.CACHES,
+            'default': {**settings.CACHES['default'], 'LOCATION': 'other'},
+        }
+        with override_settings(CACHES=caches):
+            new_user_factory(
+                email='user2@mail.com', password='password',
+                birthday_date=dt.date.today().strftime('%Y-%m-%d'),
+            )
+        assert len(client.get(self.path, **headers).json()) == 2, (
+            'Изменение в другом процессе должно сбрасывать кэш списка.'
+        )
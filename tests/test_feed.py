@@ -0,0 +1,108 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from posts.feed import follow_groups
+from posts.models import Group, Post, TimelineEntry
+
+
+@pytest.mark.django_db(transaction=True)
+class TestFeedAPI:
+    feed_url = '/api/v1/feed/'
+
+    @pytest.fixture
+    def author(self, new_user_factory):
+        return new_user_factory(email='author@mail.ru', password='123456')
+
+    def get_feed_ids(self, user_client):
+        response = user_client.get(self.feed_url)
+        assert response.status_code == HTTPStatus.OK
+        return [post['id'] for post in response.json()['results']]
+
+    def test_feed_not_auth(self, client):
+        response = client.get(self.feed_url)
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_feed_contains_subscribed_groups_posts(
+        self, user_client, authenticated_user, group_1, author
+    ):
+        user_client.post(f'/api/v1/groups/{group_1.id}/subscribe/')
+        group_post = Post.objects.create(
+            text='Пост группы', author=author, group=group_1
+        )
+        Post.objects.create(text='Пост без группы', author=author)
+
+        assert TimelineEntry.objects.filter(
+            user=authenticated_user, post=group_post
+        ).exists(), 'Пост группы должен попасть в ленту подписчика.'
+        assert self.get_feed_ids(user_client) == [group_post.id], (
+            'Лента должна содержать только посты групп из подписок.'
+        )
+
+        user_client.delete(f'/api/v1/groups/{group_1.id}/subscribe/')
+        assert self.get_feed_ids(user_client) == [], (
+            'После отписки посты группы должны пропасть из ленты.'
+        )
+
+    def test_feed_backfills_on_subscribe(self, user_client, group_1, author):
+        group_post = Post.objects.create(
+            text='Старый пост', author=author, group=group_1
+        )
+        user_client.post(f'/api/v1/groups/{group_1.id}/subscribe/')
+
+        assert self.get_feed_ids(user_client) == [group_post.id]
+
+    def test_feed_backfills_each_group(
+        self, user_client, authenticated_user, group_1, author, settings
+    ):
+        settings.FEED_BACKFILL_SIZE = 2
+        group_2 = Group.objects.create(
+            title='Вторая группа', author=author
+        )
+        quiet_post = Post.objects.create(
+            text='Пост тихой группы', author=author, group=group_2
+        )
+        busy_posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=author, group=group_1
+            )
+            for number in range(3)
+        ]
+        follow_groups(authenticated_user.pk, (group_1.pk, group_2.pk))
+
+        assert set(self.get_feed_ids(user_client)) == {
+            quiet_post.id, busy_posts[2].id, busy_posts[1].id
+        }, 'В ленту должны попасть последние посты каждой из групп.'
+
+    def test_feed_pulls_large_groups(
+        self, user_client, authenticated_user, group_1, author, settings
+    ):
+        settings.FEED_FANOUT_LIMIT = 0
+        group_1.followers.add(authenticated_user)
+        TimelineEntry.objects.all().delete()
+        group_post = Post.objects.create(
+            text='Пост крупной группы', author=author, group=group_1
+        )
+
+        assert not TimelineEntry.objects.exists(), (
+            'Посты крупных групп не должны раскладываться по лентам.'
+        )
+        assert self.get_feed_ids(user_client) == [group_post.id]
+
+    def test_rebuild_timeline(
+        self, user_client, authenticated_user, group_1, author
+    ):
+        group_1.followers.add(authenticated_user)
+        group_post = Post.objects.create(
+            text='Пост группы', author=author, group=group_1
+        )
+        TimelineEntry.objects.all().delete()
+
+        call_command(
+            'rebuild_timeline', str(authenticated_user.id), stdout=StringIO()
+        )
+
+        assert self.get_feed_ids(user_client) == [group_post.id]
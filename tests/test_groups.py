@@ -0,0 +1,178 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Group, Post
+
+
+@pytest.mark.django_db(transaction=True)
+class TestGroupsAPI:
+    group_url = '/api/v1/groups/'
+    group_subscribe_url = '/api/v1/groups/{id}/subscribe/'
+    group_posts_url = '/api/v1/groups/{id}/posts/'
+    group_followers_url = '/api/v1/groups/{id}/followers/'
+
+    def test_group_subscribe_compact_response(
+        self, user_client, authenticated_user, group_1
+    ):
+        url = self.group_subscribe_url.format(id=group_1.id)
+        response = user_client.post(url)
+
+        assert response.status_code == HTTPStatus.CREATED
+        assert response.json() == {
+            'id': group_1.id, 'subscribed': True, 'followers_count': 1
+        }, 'Ответ на подписку должен содержать только состояние подписки.'
+        assert group_1.followers.filter(id=authenticated_user.id).exists()
+
+        response = user_client.delete(url)
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'id': group_1.id, 'subscribed': False, 'followers_count': 0
+        }
+
+    def test_group_list_conditional_get(self, user_client, group_1):
+        etag = user_client.get(self.group_url)['ETag']
+        response = user_client.get(self.group_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Неизменившийся список групп должен отдаваться ответом 304.'
+        )
+
+        user_client.post(self.group_subscribe_url.format(id=group_1.id))
+        response = user_client.get(self.group_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Подписка должна менять ETag списка групп.'
+        )
+
+    def test_group_list_counts_in_one_query(
+        self, user_client, authenticated_user, group_1, new_user_factory
+    ):
+        group_2 = Group.objects.create(
+            title='Вторая группа', description='Описание', resume='Резюме',
+            author=authenticated_user,
+        )
+        group_1.add_follower(authenticated_user)
+        group_1.add_follower(
+            new_user_factory(email='follower@mail.ru', password='123456')
+        )
+        Post.objects.create(
+            text='Пост группы', author=authenticated_user, group=group_1
+        )
+        user_client.get(self.group_url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.get(self.group_url)
+        assert response.status_code == HTTPStatus.OK
+        groups = {
+            group['id']: group for group in response.json()['results']
+        }
+        assert {
+            key: groups[group_1.id][key]
+            for key in ('followers_count', 'posts_count', 'is_subscribed')
+        } == {'followers_count': 2, 'posts_count': 1, 'is_subscribed': True}
+        assert groups[group_2.id]['is_subscribed'] is False
+        assert 'posts_group' not in groups[group_1.id], (
+            'Посты группы не должны встраиваться в список без ?expand=.'
+        )
+        assert 'followers' not in groups[group_1.id]
+
+        group_3 = Group.objects.create(
+            title='Третья группа', description='Описание', resume='Резюме',
+            author=authenticated_user,
+        )
+        group_3.add_follower(authenticated_user)
+        Post.objects.create(
+            text='Ещё пост', author=authenticated_user, group=group_3
+        )
+        with CaptureQueriesContext(connection) as more_queries:
+            user_client.get(self.group_url)
+        assert len(more_queries) == len(queries), (
+            'Счётчики и подписка должны считаться в запросе страницы групп.'
+        )
+
+    def test_groups_expand_posts_queries(
+        self, user_client, authenticated_user
+    ):
+        def add_groups(count):
+            for _ in range(count):
+                group = Group.objects.create(
+                    title='Группа', description='Описание', resume='Резюме',
+                    author=authenticated_user,
+                )
+                post = Post.objects.create(
+                    text='Пост группы', author=authenticated_user, group=group
+                )
+                Comment.objects.create(
+                    text='Комментарий', author=authenticated_user, post=post
+                )
+                post.change_comments_count(1)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = user_client.get(
+                    self.group_url, {'expand': 'posts_group'}
+                )
+            assert all(
+                group['posts_group'][0]['comments']
+                for group in response.json()['results']
+            ), 'У раскрытых постов должно быть превью комментариев.'
+            return len(queries)
+
+        add_groups(2)
+        # Первый запрос создаёт недостающие отметки коллекций.
+        count_queries()
+        queries = count_queries()
+        add_groups(6)
+        assert count_queries() == queries, (
+            'Превью комментариев раскрытых постов должно загружаться '
+            'одним запросом на страницу.'
+        )
+
+    def test_group_posts_cursor_pagination(
+        self, user_client, authenticated_user, group_1
+    ):
+        posts = [
+            Post.objects.create(
+                text=f'Пост {index}', author=authenticated_user,
+                group=group_1,
+            )
+            for index in range(3)
+        ]
+        Post.objects.create(text='Без группы', author=authenticated_user)
+        url = self.group_posts_url.format(id=group_1.id)
+
+        response = user_client.get(url, {'limit': 2})
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert [post['id'] for post in data['results']] == [
+            posts[2].id, posts[1].id
+        ]
+        assert data['previous'] is None
+        data = user_client.get(data['next']).json()
+        assert [post['id'] for post in data['results']] == [posts[0].id], (
+            'Вторая страница должна продолжать первую по курсору.'
+        )
+        assert data['next'] is None
+
+    def test_group_followers_cursor_pagination(
+        self, user_client, group_1, new_user_factory
+    ):
+        followers = [
+            new_user_factory(email=f'follower_{index}@mail.ru',
+                             password='123456')
+            for index in range(3)
+        ]
+        for follower in followers:
+            group_1.add_follower(follower)
+        url = self.group_followers_url.format(id=group_1.id)
+
+        data = user_client.get(url, {'limit': 2}).json()
+        ids = [user['id'] for user in data['results']]
+        data = user_client.get(data['next']).json()
+        ids += [user['id'] for user in data['results']]
+        assert ids == sorted(follower.id for follower in followers), (
+            'Подписчики группы должны выводиться по курсору без повторов.'
+        )
+        assert data['next'] is None
@@ -0,0 +1,156 @@
+import os
+from http import HTTPStatus
+from io import StringIO
+from os import path
+from time import time
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
+
+from posts.models import File, MediaBlob, Post
+from posts.storage import media_store
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.BACKGROUND_WORKERS = 0
+
+
+@pytest.mark.django_db(transaction=True)
+class TestContentAddressedStorage:
+
+    def attach(self, post, content, name):
+        file = File(post=post, file_title=name)
+        file.file_link.save(name, ContentFile(content), save=True)
+        return file
+
+    def test_same_content_stored_once(self, authenticated_user):
+        post_1 = Post.objects.create(text='Первый', author=authenticated_user)
+        post_2 = Post.objects.create(text='Второй', author=authenticated_user)
+        file_1 = self.attach(post_1, b'%PDF-1.4 report', 'отчёт.PDF')
+        file_2 = self.attach(post_2, b'%PDF-1.4 report', 'копия.pdf')
+        other = self.attach(post_2, b'%PDF-1.4 other', 'отчёт.pdf')
+
+        assert file_1.file_link.name == file_2.file_link.name, (
+            'Одинаковое содержимое должно храниться под одним именем.'
+        )
+        assert file_1.file_link.name.startswith('cas/')
+        assert file_1.file_link.name.endswith('.pdf')
+        assert other.file_link.name != file_1.file_link.name
+        assert MediaBlob.objects.get(
+            name=file_1.file_link.name
+        ).refcount == 2
+
+        media_store.delete(file_1.file_link.name)
+        assert media_store.exists(file_2.file_link.name), (
+            'Файл удаляется, только когда на него не осталось ссылок.'
+        )
+        media_store.delete(file_2.file_link.name)
+        assert not media_store.exists(file_2.file_link.name)
+        assert not MediaBlob.objects.filter(
+            name=file_2.file_link.name
+        ).exists()
+
+    def test_attachment_files_deleted_after_commit(
+        self, user_client, authenticated_user
+    ):
+        post = Post.objects.create(text='Пост', author=authenticated_user)
+        name = self.attach(post, b'%PDF-1.4 report', 'отчёт.pdf').file_link.name
+
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                post.files.all().delete()
+                raise RuntimeError
+        assert media_store.exists(name), (
+            'При откате транзакции файл вложения остаётся на месте.'
+        )
+
+        response = user_client.delete(f'/api/v1/posts/{post.id}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert not media_store.exists(name), (
+            'Файлы вложений удаляются вместе с постом.'
+        )
+
+    def test_collect_media_garbage(
+        self, settings, tmp_path, authenticated_user
+    ):
+        post = Post.objects.create(text='Пост', author=authenticated_user)
+        kept = self.attach(post, b'%PDF-1.4 kept', 'kept.pdf').file_link.name
+        old = time() - 2 * 24 * 3600
+        names = {
+            'orphan': 'posts/files/2020/01/01/orphan.pdf',
+            'fresh': 'posts/files/2020/01/01/fresh.pdf',
+            'kept_variant': f'variants/64/{kept}.webp',
+            'orphan_variant': 'variants/64/posts/images/gone.png.webp',
+        }
+        for key, name in names.items():
+            full_path = path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as file:
+                file.write(b'data')
+            if key != 'fresh':
+                os.utime(full_path, (old, old))
+        os.utime(path.join(settings.MEDIA_ROOT, kept), (old, old))
+
+        def exists(name):
+            return path.exists(path.join(settings.MEDIA_ROOT, name))
+
+        output = StringIO()
+        call_command('collect_media_garbage', stdout=output)
+        assert 'без ссылок — 2' in output.getvalue()
+        assert all(exists(name) for name in names.values()), (
+            'Без --delete команда только выводит отчёт.'
+        )
+
+        checkpoint = str(tmp_path / 'checkpoint')
+        call_command(
+            'collect_media_garbage', '--delete', '--workers', '2',
+            '--checkpoint', checkpoint, stdout=StringIO(),
+        )
+        assert not exists(names['orphan'])
+        assert not exists(names['orphan_variant'])
+        assert exists(names['fresh']), (
+            'Файлы моложе периода ожидания не удаляются.'
+        )
+        assert exists(names['kept_variant'])
+        assert exists(kept)
+
+        os.utime(path.join(settings.MEDIA_ROOT, names['fresh']), (old, old))
+        call_command(
+            'collect_media_garbage', '--delete',
+            '--checkpoint', checkpoint, stdout=StringIO(),
+        )
+        assert exists(names['fresh']), (
+            'Обработанные каталоги из checkpoint пропускаются.'
+        )
+
+    def test_collect_media_garbage_respects_media_blobs(
+        self, settings, authenticated_user
+    ):
+        post = Post.objects.create(text='Пост', author=authenticated_user)
+        blob_name = self.attach(post, b'%PDF-1.4 blob', 'a.pdf').file_link.name
+        orphan_name = self.attach(
+            post, b'%PDF-1.4 orphan', 'b.pdf'
+        ).file_link.name
+        # Ссылки из MediaBlob остаются, записи File удалены без storage.
+        File.objects.filter(post=post).update(file_link='')
+        MediaBlob.objects.filter(name=orphan_name).delete()
+        old = time() - 2 * 24 * 3600
+        for name in (blob_name, orphan_name):
+            os.utime(media_store.path(name), (old, old))
+
+        call_command('collect_media_garbage', '--delete', stdout=StringIO())
+        assert media_store.exists(blob_name), (
+            'Файл с живыми ссылками в MediaBlob не удаляется.'
+        )
+        assert not media_store.exists(orphan_name)
+        assert not MediaBlob.objects.filter(name=orphan_name).exists()
+
+        reused = self.attach(post, b'%PDF-1.4 blob', 'c.pdf').file_link.name
+        assert reused == blob_name
+        assert path.getmtime(media_store.path(reused)) > old, (
+            'Повторно сохранённый файл не должен выглядеть старым.'
+        )
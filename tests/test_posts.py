@@ -1,8 +1,18 @@
+import json
+from base64 import urlsafe_b64encode
 from http import HTTPStatus
+from io import StringIO
 
 import pytest
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-from posts.models import Post
+from posts.models import Comment, Image, Post
 
 
 @pytest.mark.django_db(transaction=True)
@@ -298,3 +308,400 @@ class TestPostsAPI:
             'DELETE-запрос неавторизованного пользователя к '
             f'{self.post_detail_url} не должен удалять пост.'
         )
+
+    def test_post_list_cursor_pagination(self, user_client, authenticated_user):
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=authenticated_user)
+            for i in range(3)
+        ]
+        response = user_client.get(
+            self.post_url, {'pagination': 'cursor', 'limit': 2}
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert 'count' not in data, (
+            'В курсорном режиме не должно считаться количество постов.'
+        )
+        assert [post['id'] for post in data['results']] == [
+            posts[2].id, posts[1].id
+        ], 'Посты должны быть отсортированы от новых к старым.'
+        assert data['previous'] is None
+
+        response = user_client.get(data['next'])
+        data = response.json()
+        assert [post['id'] for post in data['results']] == [posts[0].id], (
+            'Ссылка next должна вести на следующую страницу ленты.'
+        )
+        assert data['next'] is None
+
+        response = user_client.get(data['previous'])
+        assert [post['id'] for post in response.json()['results']] == [
+            posts[2].id, posts[1].id
+        ], 'Ссылка previous должна вести на предыдущую страницу ленты.'
+
+    def test_post_list_invalid_cursor(self, user_client):
+        response = user_client.get(self.post_url, {'cursor': 'invalid'})
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    @pytest.mark.parametrize('position', (
+        ['garbage', 1],
+        [{'created_at': 1}, 1],
+        [None, 1],
+        ['2024-01-01T00:00:00+00:00', 'garbage'],
+    ))
+    def test_post_list_malformed_cursor(self, user_client, post_1, position):
+        cursor = urlsafe_b64encode(
+            json.dumps({'p': position}).encode()
+        ).decode()
+        response = user_client.get(self.post_url, {'cursor': cursor})
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Подделанный курсор должен отклоняться ответом 404.'
+        )
+
+    def test_post_search_malformed_cursor(self, user_client, post_1):
+        cursor = urlsafe_b64encode(json.dumps(
+            {'p': ['garbage', '2024-01-01T00:00:00+00:00', 1]}
+        ).encode()).decode()
+        response = user_client.get(
+            self.post_url, {'cursor': cursor, 'q': 'пост'}
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Подделанный курсор поиска должен отклоняться ответом 404.'
+        )
+
+    def test_post_edit_keeps_feed_order(
+        self, user_client, authenticated_user
+    ):
+        older = Post.objects.create(text='Старый', author=authenticated_user)
+        newer = Post.objects.create(text='Новый', author=authenticated_user)
+        created_at = older.created_at
+
+        user_client.patch(
+            self.post_detail_url.format(id=older.id), data={'text': 'Правка'}
+        )
+        older.refresh_from_db()
+        assert older.created_at == created_at, (
+            'Редактирование поста не должно менять время публикации.'
+        )
+
+        response = user_client.get(self.post_url)
+        assert [post['id'] for post in response.json()['results']] == [
+            newer.id, older.id
+        ], 'Редактирование поста не должно менять его место в ленте.'
+
+    def test_post_list_queries_do_not_depend_on_page_size(
+        self, user_client, authenticated_user
+    ):
+        def create_post():
+            post = Post.objects.create(
+                text='Пост', author=authenticated_user
+            )
+            post.likes.add(authenticated_user)
+            comment = Comment.objects.create(
+                text='Комментарий', post=post, author=authenticated_user
+            )
+            comment.like.add(authenticated_user)
+
+        create_post()
+        with CaptureQueriesContext(connection) as single_post:
+            user_client.get(self.post_url)
+        for _ in range(5):
+            create_post()
+        with CaptureQueriesContext(connection) as many_posts:
+            response = user_client.get(self.post_url)
+
+        assert len(response.json()['results']) == 6
+        assert len(many_posts) == len(single_post), (
+            'Количество запросов к БД при выводе ленты не должно зависеть '
+            'от количества постов на странице.'
+        )
+
+    def test_post_like_counters(self, user_client, post_1):
+        url = self.post_like_url.format(id=post_1.id)
+        user_client.post(url)
+        user_client.post(url)
+        post_1.refresh_from_db()
+        assert post_1.likes_count == 1, (
+            'Повторный лайк не должен увеличивать счётчик лайков.'
+        )
+
+        user_client.delete(url)
+        user_client.delete(url)
+        post_1.refresh_from_db()
+        assert post_1.likes_count == 0, (
+            'Повторная отмена лайка не должна уменьшать счётчик лайков.'
+        )
+
+    def test_post_comments_counter(self, user_client, post_1):
+        comments_url = f'/api/v1/posts/{post_1.id}/comments/'
+        response = user_client.post(comments_url, data={'text': 'Коммент'})
+        post_1.refresh_from_db()
+        assert post_1.comments_count == 1
+
+        user_client.delete(f'{comments_url}{response.json()["id"]}/')
+        post_1.refresh_from_db()
+        assert post_1.comments_count == 0
+
+    def test_reconcile_counters(self, post_1, authenticated_user):
+        post_1.likes.add(authenticated_user)
+        Comment.objects.create(
+            text='Комментарий', post=post_1, author=authenticated_user
+        )
+
+        call_command('reconcile_counters', stdout=StringIO())
+
+        post_1.refresh_from_db()
+        assert post_1.likes_count == 1
+        assert post_1.comments_count == 1
+
+    def test_post_like_compact_response(self, user_client, post_1):
+        response = user_client.post(self.post_like_url.format(id=post_1.id))
+
+        assert response.json() == {
+            'id': post_1.id, 'liked': True, 'like_count': 1
+        }, 'Ответ на лайк должен содержать только состояние лайка.'
+
+        response = user_client.delete(
+            self.post_like_url.format(id=post_1.id), QUERY_STRING='full=true'
+        )
+        data = response.json()
+        assert data['like_count'] == 0
+        self.check_post_data(data, self.post_like_url)
+
+    def test_post_liked_by_me(self, user_client, post_1, new_user_factory):
+        other_post = Post.objects.create(
+            text='Чужой пост',
+            author=new_user_factory(email='other@mail.ru', password='123'),
+        )
+        post_1.add_like(post_1.author)
+
+        response = user_client.get(self.post_url)
+        liked = {
+            post['id']: post['liked_by_me']
+            for post in response.json()['results']
+        }
+        assert liked == {post_1.id: True, other_post.id: False}, (
+            'Поле liked_by_me должно показывать лайк текущего пользователя.'
+        )
+        assert 'likes' not in response.json()['results'][0], (
+            'Пост не должен содержать полный список лайкнувших.'
+        )
+
+    def test_post_likers_list(self, user_client, post_1, new_user_factory):
+        users = [
+            new_user_factory(email=f'liker{i}@mail.ru', password='123')
+            for i in range(3)
+        ]
+        for user in users:
+            post_1.add_like(user)
+        url = f'/api/v1/posts/{post_1.id}/likes/'
+
+        response = user_client.get(url, {'limit': 2})
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert [user['id'] for user in data['results']] == [
+            users[0].id, users[1].id
+        ]
+
+        response = user_client.get(data['next'])
+        assert [user['id'] for user in response.json()['results']] == [
+            users[2].id
+        ]
+
+    def test_post_comments_preview(self, user_client, authenticated_user):
+        posts = [
+            Post.objects.create(text='Пост', author=authenticated_user)
+            for _ in range(2)
+        ]
+        for post in posts:
+            for i in range(settings.COMMENTS_PREVIEW_SIZE + 2):
+                user_client.post(
+                    f'/api/v1/posts/{post.id}/comments/',
+                    data={'text': f'Комментарий {i}'},
+                )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.get(self.post_url)
+        preview_queries = [
+            query for query in queries if 'ROW_NUMBER' in query['sql']
+        ]
+        assert len(preview_queries) == 1, (
+            'Превью комментариев всей страницы должно загружаться '
+            'одним запросом.'
+        )
+        for post in response.json()['results']:
+            assert post['comments_count'] == settings.COMMENTS_PREVIEW_SIZE + 2
+            assert [comment['text'] for comment in post['comments']] == [
+                f'Комментарий {i}'
+                for i in range(2, settings.COMMENTS_PREVIEW_SIZE + 2)
+            ], 'В ленте должны быть только последние комментарии поста.'
+
+    def test_post_cache_invalidated_on_change(self, user_client, post_1):
+        detail_url = self.post_detail_url.format(id=post_1.id)
+        user_client.get(self.post_url)
+        with CaptureQueriesContext(connection) as queries:
+            user_client.get(self.post_url)
+        assert not any(
+            'posts_image' in query['sql'] for query in queries
+        ), 'Повторный вывод ленты должен брать посты из кэша.'
+
+        user_client.patch(detail_url, data={'text': 'Новый текст'})
+        user_client.post(self.post_like_url.format(id=post_1.id))
+        user_client.post(
+            f'/api/v1/posts/{post_1.id}/comments/',
+            data={'text': 'Комментарий'},
+        )
+        post = user_client.get(self.post_url).json()['results'][0]
+        assert post['text'] == 'Новый текст', (
+            'Изменение поста должно сбрасывать его кэш.'
+        )
+        assert post['like_count'] == 1, (
+            'Лайк должен сбрасывать кэш поста.'
+        )
+        assert [comment['text'] for comment in post['comments']] == [
+            'Комментарий'
+        ], 'Комментарий должен сбрасывать кэш поста.'
+        assert user_client.get(detail_url).json() == post
+
+    @override_settings(MEDIA_URL='/media/')
+    def test_post_cache_urls_follow_request_host(self, user_client, post_1):
+        Image.objects.create(post=post_1, image_link='posts/photo.png')
+        for host in ('internal', 'public.example.com'):
+            image = user_client.get(
+                self.post_url, HTTP_HOST=host
+            ).json()['results'][0]['images'][0]
+            assert image['image_link'] == (
+                f'http://{host}/media/posts/photo.png'
+            ), 'Ссылки на файлы должны строиться от хоста запроса.'
+            assert all(
+                url.startswith(f'http://{host}/media/')
+                for urls in image['image_variants'].values()
+                for url in urls.values()
+            ), 'Ссылки на копии должны строиться от хоста запроса.'
+
+    def test_post_cache_liked_by_me_is_personal(
+        self, user_client, post_1, django_user_model
+    ):
+        other_client = APIClient()
+        other_client.force_authenticate(
+            django_user_model.objects.create_user(
+                email='other@mail.ru', password='123456'
+            )
+        )
+        user_client.post(self.post_like_url.format(id=post_1.id))
+        detail_url = self.post_detail_url.format(id=post_1.id)
+
+        assert user_client.get(detail_url).json()['liked_by_me'] is True
+        other_post = other_client.get(detail_url).json()
+        assert other_post['like_count'] == 1
+        assert other_post['liked_by_me'] is False, (
+            'liked_by_me не должен попадать в общий кэш постов.'
+        )
+
+    def test_post_list_conditional_get(self, user_client, post_1):
+        response = user_client.get(self.post_url)
+        etag = response['ETag']
+
+        response = user_client.get(self.post_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Неизменившаяся лента должна отдаваться ответом 304.'
+        )
+
+        user_client.post(self.post_like_url.format(id=post_1.id))
+        response = user_client.get(self.post_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Лайк должен менять ETag ленты.'
+        )
+        assert response['ETag'] != etag
+
+        detail_url = self.post_detail_url.format(id=post_1.id)
+        etag = user_client.get(detail_url)['ETag']
+        response = user_client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    def test_post_list_not_modified_without_posts_queries(
+        self, user_client, post_1
+    ):
+        etag = user_client.get(self.post_url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.get(
+                self.post_url, HTTP_IF_NONE_MATCH=etag
+            )
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert not [
+            query for query in queries if 'posts_post' in query['sql']
+        ], 'Ответ 304 не должен читать таблицу постов.'
+
+        Post.objects.create(text='Новый пост', author=post_1.author)
+        response = user_client.get(self.post_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Новый пост должен менять ETag ленты.'
+        )
+
+    def test_post_list_etag_shared_between_processes(
+        self, user_client, post_1
+    ):
+        etag = user_client.get(self.post_url)['ETag']
+        # Кэш в памяти другого процесса приложения пуст.
+        for cache in caches.all():
+            cache.clear()
+        response = user_client.get(self.post_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Отметки коллекций должны быть общими для всех процессов.'
+        )
+
+    def test_post_search(self, user_client, authenticated_user):
+        for text in (
+            'Отчёт о конференции',
+            'Конференция, конференция и снова конференция',
+            'Обед в столовой',
+        ):
+            Post.objects.create(text=text, author=authenticated_user)
+        edited = Post.objects.create(text='Черновик', author=authenticated_user)
+        edited.text = 'Итоги: конференция'
+        edited.save()
+
+        response = user_client.get(self.post_url, {'q': 'КОНФЕРЕНЦИЯ'})
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert 'next' in data and 'count' not in data, (
+            'Поиск должен выводиться постранично по курсору.'
+        )
+        texts = [post['text'] for post in data['results']]
+        assert texts[0] == 'Конференция, конференция и снова конференция', (
+            'Результаты поиска должны быть отсортированы по релевантности.'
+        )
+        assert set(texts) == {
+            'Конференция, конференция и снова конференция',
+            'Итоги: конференция',
+        }, 'Поиск должен учитывать изменения текста постов.'
+
+        first_page = user_client.get(
+            self.post_url, {'q': 'конференция', 'limit': 1}
+        ).json()
+        second_page = user_client.get(first_page['next']).json()
+        assert [post['text'] for post in (
+            first_page['results'] + second_page['results']
+        )] == texts
+
+        response = user_client.get(self.post_url, {'q': '"* OR ('})
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['results'] == []
+
+    def test_comments_list_pagination(self, user_client, post_1):
+        comments_url = f'/api/v1/posts/{post_1.id}/comments/'
+        for i in range(3):
+            user_client.post(comments_url, data={'text': f'Комментарий {i}'})
+
+        response = user_client.get(comments_url, {'limit': 2})
+        data = response.json()
+        assert [comment['text'] for comment in data['results']] == [
+            'Комментарий 0', 'Комментарий 1'
+        ]
+
+        response = user_client.get(data['next'])
+        assert [
+            comment['text'] for comment in response.json()['results']
+        ] == ['Комментарий 2']
@@ -0,0 +1,96 @@
+import json
+import logging
+from http import HTTPStatus
+
+import pytest
+
+from api.log_handlers import QueueFileHandler
+from api.request_log import RequestLogMessage, format_body
+
+
+def get_log_entries(caplog):
+    return [
+        json.loads(str(record.msg)) for record in caplog.records
+        if isinstance(record.msg, RequestLogMessage)
+    ]
+
+
+@pytest.mark.django_db
+class TestRequestLog:
+    login_url = '/api/v1/auth/token/login/'
+
+    def test_error_logged_with_redacted_body(
+            self, client, authenticated_user, caplog
+    ):
+        response = client.post(
+            self.login_url,
+            {'email': authenticated_user.email, 'password': 'не-тот-пароль'},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Вход с неверным паролем должен возвращать 400'
+        )
+        entry, = get_log_entries(caplog)
+        assert 'не-тот-пароль' not in entry['request_body'], (
+            'Пароль не должен попадать в журнал'
+        )
+        assert '"password": "***"' in entry['request_body'], (
+            'Вместо пароля в журнале должна быть заглушка'
+        )
+        assert 'response_body' in entry, (
+            'Тело ответа с ошибкой должно попадать в журнал всегда'
+        )
+
+    def test_bodies_sampled(self, user_client, settings, caplog):
+        settings.REQUEST_LOG_SAMPLE_RATE = 0
+        user_client.get('/api/v1/posts/')
+        entry, = get_log_entries(caplog)
+        assert entry['response_status'] == HTTPStatus.OK
+        assert 'response_body' not in entry, (
+            'Тело успешного ответа вне выборки не должно попадать в журнал'
+        )
+
+        caplog.clear()
+        settings.REQUEST_LOG_SAMPLE_RATE = 1
+        user_client.get('/api/v1/posts/')
+        entry, = get_log_entries(caplog)
+        assert 'response_body' in entry, (
+            'Тело ответа из выборки должно попадать в журнал'
+        )
+
+
+class TestFormatBody:
+
+    def test_truncated_body_redacted(self):
+        body = b'{"text": "ok", "token": "abcdef'
+        text = format_body((body, 1000))
+        assert 'abcdef' not in text, (
+            'Обрезанное значение скрываемого поля не должно попадать в журнал'
+        )
+        assert text.endswith('(1000 байт)'), (
+            'У обрезанного тела должен быть указан полный размер'
+        )
+
+    def test_body_not_formatted_in_request_thread(self):
+        message = RequestLogMessage({'request_body': (b'{}', 2)})
+        record = logging.makeLogRecord({'msg': message})
+        handler = QueueFileHandler('unused.log')
+        assert handler.prepare(record).msg is message, (
+            'Сообщение должно форматироваться в потоке слушателя очереди'
+        )
+
+
+def test_queue_file_handler_writes_file(tmp_path):
+    filename = tmp_path / 'info.log'
+    handler = QueueFileHandler(str(filename), max_bytes=100, backup_count=2)
+    handler.setFormatter(logging.Formatter('{message}', style='{'))
+    for number in range(10):
+        handler.handle(logging.makeLogRecord({'msg': f'запись {number:02}'}))
+    handler.close()
+    lines = filename.read_text('utf-8').splitlines()
+    assert lines[-1] == 'запись 09', (
+        'Записи должны попадать в файл после остановки слушателя'
+    )
+    assert (tmp_path / 'info.log.1').exists(), (
+        'Файл журнала должен ротироваться по размеру'
+    )
@@ -0,0 +1,87 @@
+import logging
+
+import pytest
+from django.db import OperationalError, connection
+from django.test import RequestFactory
+
+from api.slow_query_log import SlowQueryLogger, get_fingerprint
+from users.models import CustomUser
+
+
+def get_messages(caplog, name):
+    return [
+        record.getMessage() for record in caplog.records
+        if record.name == name
+    ]
+
+
+def test_fingerprint_ignores_values():
+    first = get_fingerprint(
+        "SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'a''b' LIMIT 21"
+    )
+    second = get_fingerprint(
+        'SELECT *  FROM t\nWHERE id IN (%s) AND name = %s LIMIT 5'
+    )
+    assert first == second, (
+        'Запросы, отличающиеся только значениями, должны совпадать'
+    )
+    assert first == 'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?'
+
+
+@pytest.mark.django_db
+class TestSlowQueryLog:
+
+    def test_fast_queries_not_logged(self, user_client, settings, caplog):
+        settings.SLOW_QUERY_THRESHOLD = 10_000
+        user_client.get('/api/v1/posts/')
+        assert not get_messages(caplog, 'slow_queries'), (
+            'Быстрые запросы не должны попадать в журнал'
+        )
+
+    def test_slow_queries_logged(self, user_client, settings, caplog):
+        settings.SLOW_QUERY_THRESHOLD = 0
+        settings.SLOW_QUERY_EXPLAIN = True
+        user_client.get('/api/v1/posts/')
+        messages = get_messages(caplog, 'slow_queries')
+        assert messages, 'Запросы дольше порога должны попадать в журнал'
+        assert all('представление: api:posts-list' in message
+                   for message in messages), (
+            'В журнале должно быть указано представление'
+        )
+        assert any('SCAN' in message or 'SEARCH' in message
+                   for message in messages), (
+            'С SLOW_QUERY_EXPLAIN в журнал должен попадать план запроса'
+        )
+
+
+@pytest.mark.django_db
+def test_audit_log(user_client, caplog):
+    caplog.set_level(logging.INFO, logger='audit')
+    response = user_client.post(
+        '/api/v1/posts/', {'text': 'Пост для журнала'}, format='json'
+    )
+    post_id = response.json()['id']
+    assert f'Создан пост id#{post_id}' in get_messages(caplog, 'audit'), (
+        'Создание поста должно попадать в журнал audit'
+    )
+
+
+@pytest.mark.django_db
+def test_failed_query_not_explained(settings, caplog):
+    settings.SLOW_QUERY_THRESHOLD = 0
+    settings.SLOW_QUERY_EXPLAIN = True
+    query_logger = SlowQueryLogger(RequestFactory().get('/'))
+    with connection.execute_wrapper(query_logger):
+        with pytest.raises(OperationalError, match='no such table'):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT * FROM missing_table')
+        assert not CustomUser.objects.filter(pk=0).exists(), (
+            'После ошибки запроса соединение должно работать.'
+        )
+    messages = get_messages(caplog, 'slow_queries')
+    assert any('missing_table' in message for message in messages), (
+        'Упавший медленный запрос тоже должен попадать в журнал.'
+    )
+    assert not any('EXPLAIN' in message for message in messages), (
+        'Для упавшего запроса EXPLAIN не выполняется.'
+    )
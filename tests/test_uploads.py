@@ -0,0 +1,216 @@
+import os
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+from os import path
+from time import time
+from uuid import uuid4
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from api.v1.serializers import PostSerializer
+from posts.models import Post, Upload
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 40
+
+
+@pytest.fixture(autouse=True)
+def upload_dirs(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.UPLOADS_TEMP_DIR = str(tmp_path / 'uploads')
+    settings.BACKGROUND_WORKERS = 0
+
+
+@pytest.mark.django_db(transaction=True)
+class TestUploadsAPI:
+    upload_url = '/api/v1/uploads/'
+    upload_detail_url = '/api/v1/uploads/{token}/'
+    post_url = '/api/v1/posts/'
+
+    def put_chunk(self, client, token, data, start, size):
+        return client.put(
+            self.upload_detail_url.format(token=token),
+            data=data,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{size}',
+        )
+
+    def test_chunked_upload_resume_and_attach(self, user_client, settings):
+        response = user_client.post(
+            self.upload_url, {'filename': 'фото.png', 'size': len(PNG)}
+        )
+        assert response.status_code == HTTPStatus.CREATED
+        token = response.json()['token']
+
+        response = self.put_chunk(user_client, token, PNG[:4096], 0, len(PNG))
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['offset'] == 4096
+
+        response = self.put_chunk(
+            user_client, token, PNG[8192:], 8192, len(PNG)
+        )
+        assert response.status_code == HTTPStatus.CONFLICT, (
+            'Часть не с текущей позиции должна отклоняться.'
+        )
+        offset = user_client.get(
+            self.upload_detail_url.format(token=token)
+        ).json()['offset']
+        assert offset == 4096, 'Загрузку можно продолжить с offset.'
+
+        response = self.put_chunk(
+            user_client, token, PNG[offset:], offset, len(PNG)
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['is_complete'] is True
+        assert response.json()['extension'] == 'png'
+
+        response = user_client.post(
+            self.post_url, {'text': 'Пост с фото', 'uploads': [token]},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        post = Post.objects.get(id=response.json()['id'])
+        image = post.images.get()
+        assert image.image_link.name.endswith('.png')
+        with image.image_link.open('rb') as stored:
+            assert stored.read() == PNG, (
+                'Прикреплённый файл должен совпадать с загруженным.'
+            )
+        assert not Upload.objects.filter(token=token).exists()
+        assert not path.exists(path.join(
+            settings.UPLOADS_TEMP_DIR, f'{token.replace("-", "")}.part'
+        )), 'Временный файл удаляется после прикрепления.'
+
+    def test_multipart_upload(self, user_client):
+        file = SimpleUploadedFile('заметки.txt', 'Текст'.encode())
+        response = user_client.post(
+            self.upload_url, {'file': file}, format='multipart'
+        )
+        assert response.status_code == HTTPStatus.CREATED
+        data = response.json()
+        assert data['is_complete'] is True
+        assert data['extension'] == 'txt'
+
+    def test_upload_rejects_unknown_type(self, user_client):
+        file = SimpleUploadedFile('setup.pdf', b'MZ' + bytes(1024))
+        response = user_client.post(
+            self.upload_url, {'file': file}, format='multipart'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Тип файла определяется по содержимому, а не по имени.'
+        )
+        assert not Upload.objects.exists()
+
+    def test_attach_requires_own_complete_upload(
+        self, user_client, new_user_factory
+    ):
+        other = new_user_factory(email='other@mail.ru', password='123456')
+        foreign = Upload.objects.create(
+            owner=other, filename='a.png', size=len(PNG), offset=len(PNG),
+            extension='png',
+        )
+        response = user_client.post(
+            self.post_url, {'text': 'Пост', 'uploads': [str(foreign.token)]},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Чужую загрузку нельзя прикрепить к посту.'
+        )
+
+        token = user_client.post(
+            self.upload_url, {'filename': 'a.png', 'size': len(PNG)}
+        ).json()['token']
+        response = user_client.post(
+            self.post_url, {'text': 'Пост', 'uploads': [token]},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Незавершённую загрузку нельзя прикрепить к посту.'
+        )
+
+    def test_upload_filename_cleaned(self, user_client):
+        file = SimpleUploadedFile('заметки.txt', 'Текст'.encode())
+        response = user_client.post(
+            self.upload_url, {'file': file, 'filename': '../../заметки.txt'},
+            format='multipart',
+        )
+        assert response.status_code == HTTPStatus.CREATED
+        assert response.json()['filename'] == 'заметки.txt', (
+            'Путь из имени файла должен отбрасываться.'
+        )
+        response = user_client.post(
+            self.post_url,
+            {'text': 'Пост', 'uploads': [response.json()['token']]},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+
+        response = user_client.post(
+            self.upload_url, {'filename': '..', 'size': 10}
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Имя файла без допустимых символов должно отклоняться.'
+        )
+
+    def test_attach_claimed_upload(self, user_client, authenticated_user):
+        file = SimpleUploadedFile('заметки.txt', 'Текст'.encode())
+        token = user_client.post(
+            self.upload_url, {'file': file}, format='multipart'
+        ).json()['token']
+        request = RequestFactory().post(self.post_url)
+        request.user = authenticated_user
+        serializer = PostSerializer(
+            data={'text': 'Пост', 'uploads': [token]},
+            context={'request': request},
+        )
+        assert serializer.is_valid(), serializer.errors
+        # Пока пост проверялся, загрузку прикрепил другой запрос.
+        Upload.objects.filter(token=token).delete()
+        with pytest.raises(ValidationError):
+            serializer.save(author=authenticated_user)
+        assert not Post.objects.exists(), (
+            'Пост с уже прикреплённой загрузкой не должен создаваться.'
+        )
+
+    def test_purge_expired_uploads(self, user_client, settings):
+        tokens = [
+            user_client.post(
+                self.upload_url, {'filename': 'a.png', 'size': len(PNG)}
+            ).json()['token']
+            for _ in range(2)
+        ]
+        for token in tokens:
+            self.put_chunk(user_client, token, PNG[:4096], 0, len(PNG))
+        expired, fresh = (Upload.objects.get(token=token) for token in tokens)
+        Upload.objects.filter(pk=expired.pk).update(
+            created_at=timezone.now() - timedelta(
+                hours=settings.UPLOAD_EXPIRE_HOURS + 1
+            )
+        )
+        stray = path.join(settings.UPLOADS_TEMP_DIR, f'{uuid4().hex}.part')
+        with open(stray, 'wb') as temp:
+            temp.write(PNG)
+        old = time() - (settings.UPLOAD_EXPIRE_HOURS + 1) * 3600
+        os.utime(stray, (old, old))
+
+        response = user_client.get(
+            self.upload_detail_url.format(token=tokens[0])
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Просроченная загрузка не должна быть доступна.'
+        )
+
+        call_command('purge_uploads', stdout=StringIO())
+        assert list(Upload.objects.all()) == [fresh], (
+            'Удаляться должны только просроченные загрузки.'
+        )
+        assert not path.exists(expired.get_temp_path())
+        assert not path.exists(stray), (
+            'Временный файл без загрузки должен удаляться.'
+        )
+        assert path.exists(fresh.get_temp_path())
@@ -1,8 +1,13 @@
 import pytest
-
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 
+from posts.models import Comment, Post
 from users.models import CustomUser
+from users.search import trigram_index
 
 pytestmark = pytest.mark.django_db
 
@@ -215,3 +220,211 @@ class TestUsersEndpoints:
             assert user.exists() is True
         else:
             assert user.exists() is False
+
+
+class TestUsersAPI:
+
+    def test_users_me_conditional_get(self, user_client, authenticated_user):
+        url = '/api/v1/users/me/'
+        etag = user_client.get(url)['ETag']
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        authenticated_user.first_name = 'Иван'
+        authenticated_user.save()
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK, (
+            'Изменение профиля должно менять ETag.'
+        )
+
+    def test_address_book_fuzzy_search(self, user_client, new_user_factory):
+        url = '/api/v1/addressbook'
+        for email, last_name, job_title in (
+            ('ivanov@mail.ru', 'Иванов', 'Разработчик'),
+            ('ivanova@mail.ru', 'Иваненко', 'Бухгалтер'),
+            ('petrov@mail.ru', 'Петров', 'Аналитик'),
+        ):
+            new_user_factory(
+                email=email, password='Password123',
+                last_name=last_name, job_title=job_title,
+            )
+
+        response = user_client.get(url, {'search': 'Ивнов'})
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()['results']
+        assert results and results[0]['last_name'] == 'Иванов', (
+            'Поиск должен находить фамилию с опечаткой.'
+        )
+        assert 'Петров' not in [user['last_name'] for user in results]
+
+        response = user_client.get(url, {'search': 'разраб'})
+        assert [user['email'] for user in response.json()['results']] == [
+            'ivanov@mail.ru'
+        ], 'Поиск должен работать по должности.'
+
+    def test_trigram_index_refreshed_by_stamp(self, new_user_factory):
+        trigram_index.refresh()
+        with CaptureQueriesContext(connection) as queries:
+            trigram_index.refresh()
+        assert not [
+            query for query in queries
+            if 'users_customuser' in query['sql']
+        ], 'Актуальный индекс не должен читать таблицу пользователей.'
+
+        user = new_user_factory(
+            email='sidorov@mail.ru', password='Password123',
+            last_name='Сидоров',
+        )
+        assert [user_id for user_id, _ in trigram_index.search(
+            'Сидоров', 0.5
+        )] == [user.pk], 'Новый пользователь должен попадать в индекс.'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_users_autocomplete(self, user_client, new_user_factory):
+        url = '/api/v1/users/autocomplete/'
+        ivanov = new_user_factory(
+            email='ivanov@mail.ru', password='Password123',
+            first_name='Пётр', last_name='Иванов',
+        )
+        new_user_factory(
+            email='petrov@mail.ru', password='Password123',
+            first_name='Иван', last_name='Петров',
+        )
+
+        response = user_client.get(url, {'prefix': 'ива'})
+        assert response.status_code == status.HTTP_200_OK
+        assert {user['last_name'] for user in response.json()} == {
+            'Иванов', 'Петров'
+        }, 'Автодополнение должно искать по началу имени и фамилии.'
+
+        response = user_client.get(url, {'prefix': 'иванов пёт'})
+        assert [user['id'] for user in response.json()] == [ivanov.id], (
+            'Каждое слово запроса должно совпадать с началом ключа.'
+        )
+
+        ivanov.last_name = 'Сидоров'
+        ivanov.save()
+        response = user_client.get(url, {'prefix': 'сидор'})
+        assert [user['id'] for user in response.json()] == [ivanov.id], (
+            'Изменения пользователя должны попадать в индекс.'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_short_info_counters(self, user_client, authenticated_user):
+        url = f'/api/v1/users/short_info/{authenticated_user.id}/'
+        post = Post.objects.create(text='Пост', author=authenticated_user)
+        post.add_like(authenticated_user)
+        Comment.objects.create(
+            text='Комментарий', post=post, author=authenticated_user
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.get(url)
+        info = response.json()['results'][0]
+        assert (
+            info['posts_count'], info['comments_count'],
+            info['likes_received'],
+        ) == (1, 1, 1)
+        assert len([
+            query for query in queries if 'posts_post' in query['sql']
+        ]) == 1, 'Карточка пользователя должна собираться одним запросом.'
+
+        Post.objects.create(text='Второй пост', author=authenticated_user)
+        info = user_client.get(url).json()['results'][0]
+        assert info['posts_count'] == 2, (
+            'Новый пост должен сбрасывать кэш карточки пользователя.'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_short_info_invalidated_by_other_process(
+        self, user_client, authenticated_user
+    ):
+        url = f'/api/v1/users/short_info/{authenticated_user.id}/'
+        assert user_client.get(url).json()['results'][0]['posts_count'] == 0
+
+        # У другого процесса приложения свой кэш в памяти.
+        caches = {
+            **settings.CACHES,
+            'default': {**settings.CACHES['default'], 'LOCATION': 'other'},
+        }
+        with override_settings(CACHES=caches):
+            Post.objects.create(text='Пост', author=authenticated_user)
+        info = user_client.get(url).json()['results'][0]
+        assert info['posts_count'] == 1, (
+            'Изменение в другом процессе должно сбрасывать кэш карточки.'
+        )
+
+    def test_short_info_query_params_bypass_cache(
+        self, user_client, authenticated_user
+    ):
+        url = f'/api/v1/users/short_info/{authenticated_user.id}/'
+        full = user_client.get(url).json()['results'][0]
+
+        info = user_client.get(
+            url, {'fields': 'posts_count,comments_count'}
+        ).json()['results'][0]
+        assert set(info) == {'posts_count', 'comments_count'}, (
+            'Запрос с ?fields= не должен получать закэшированную карточку.'
+        )
+        assert user_client.get(url).json()['results'][0] == full, (
+            'Запрос с ?fields= не должен попадать в кэш карточки.'
+        )
+
+    def test_users_expand_posts_queries(self, user_client, new_user_factory):
+        def add_users(start, stop):
+            for number in range(start, stop):
+                user = new_user_factory(
+                    email=f'colleague_{number}@mail.ru', password='Password123'
+                )
+                post = Post.objects.create(text='Пост', author=user)
+                Comment.objects.create(
+                    text='Комментарий', author=user, post=post
+                )
+                post.change_comments_count(1)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = user_client.get(
+                    '/api/v1/users/', {'expand': 'posts'}
+                )
+            assert all(
+                user['posts'][0]['comments']
+                for user in response.json()['results']
+                if user['posts']
+            ), 'У раскрытых постов должно быть превью комментариев.'
+            return len(queries)
+
+        add_users(0, 2)
+        # Первый запрос создаёт недостающие отметки коллекций.
+        count_queries()
+        queries = count_queries()
+        add_users(2, 8)
+        assert count_queries() == queries, (
+            'Превью комментариев раскрытых постов должно загружаться '
+            'одним запросом на страницу.'
+        )
+
+    def test_users_fields_and_expand(self, user_client, authenticated_user):
+        url = f'/api/v1/users/{authenticated_user.id}/'
+        Post.objects.create(text='Пост', author=authenticated_user)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = user_client.get(url).json()
+        assert 'posts' not in data and 'followings' not in data, (
+            'Вложенные коллекции должны выводиться только по ?expand=.'
+        )
+        assert not any('posts_post' in query['sql'] for query in queries)
+
+        data = user_client.get(url, {'expand': 'posts,followings'}).json()
+        assert [post['text'] for post in data['posts']] == ['Пост']
+        assert data['followings'] == []
+
+        data = user_client.get(url, {'fields': 'id,email'}).json()
+        assert data == {
+            'id': authenticated_user.id, 'email': authenticated_user.email
+        }, '?fields= должен ограничивать набор полей ответа.'
+
+        data = user_client.get('/api/v1/posts/', {'fields': 'id,text'}).json()
+        assert data['results'] == [
+            {'id': data['results'][0]['id'], 'text': 'Пост'}
+        ]
@@ -0,0 +1,86 @@
+from http import HTTPStatus
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image as PILImage
+
+from posts.models import Post
+from posts.variants import VARIANT_FORMATS, VARIANT_SIZES, get_variant_name
+
+
+def make_png(size=(300, 200)):
+    buffer = BytesIO()
+    PILImage.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.UPLOADS_TEMP_DIR = str(tmp_path / 'uploads')
+    settings.BACKGROUND_WORKERS = 0
+
+
+@pytest.mark.django_db(transaction=True)
+class TestImageVariants:
+    variant_url = '/media/variants/{size}/{name}.{extension}'
+
+    def test_variants_generated_for_attached_image(self, user_client):
+        png = make_png()
+        token = user_client.post(
+            '/api/v1/uploads/',
+            {'file': ContentFile(png, name='фото.png')},
+            format='multipart',
+        ).json()['token']
+        response = user_client.post(
+            '/api/v1/posts/', {'text': 'Пост', 'uploads': [token]},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.CREATED
+
+        name = Post.objects.get().images.get().image_link.name
+        for size in VARIANT_SIZES:
+            for extension in VARIANT_FORMATS:
+                assert default_storage.exists(
+                    get_variant_name(name, size, extension)
+                ), 'Копии изображения создаются после сохранения поста.'
+        with default_storage.open(get_variant_name(name, 256, 'jpg')) as f:
+            assert PILImage.open(f).size == (256, 171)
+        with default_storage.open(get_variant_name(name, 1024, 'webp')) as f:
+            assert PILImage.open(f).size == (300, 200), (
+                'Маленькие изображения не увеличиваются.'
+            )
+
+        variants = user_client.get(
+            f'/api/v1/posts/{response.json()["id"]}/'
+        ).json()['images'][0]['image_variants']
+        assert variants['64']['webp'] == default_storage.url(
+            get_variant_name(name, 64, 'webp')
+        ), 'Ссылки на копии выводятся вместе с изображением.'
+
+    def test_missing_variant_generated_on_request(self, client):
+        name = default_storage.save('posts/images/photo.png',
+                                    ContentFile(make_png()))
+        response = client.get(
+            self.variant_url.format(size=64, name=name, extension='webp')
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response['Content-Type'] == 'image/webp'
+        assert PILImage.open(
+            BytesIO(b''.join(response.streaming_content))
+        ).size == (64, 43)
+        assert default_storage.exists(get_variant_name(name, 64, 'webp')), (
+            'Созданная по запросу копия сохраняется в хранилище.'
+        )
+
+        for size, extension in ((65, 'webp'), (64, 'gif')):
+            response = client.get(self.variant_url.format(
+                size=size, name=name, extension=extension
+            ))
+            assert response.status_code == HTTPStatus.NOT_FOUND
+        response = client.get(
+            self.variant_url.format(size=64, name='nope.png', extension='jpg')
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,158 @@
+from bisect import bisect_left, insort
+from threading import RLock
+from time import monotonic
+
+from django.conf import settings
+
+from .models import CustomUser
+
+# Поля ответа автодополнения, они же хранятся в индексе.
+USER_FIELDS = (
+    'id', 'first_name', 'last_name', 'middle_name', 'job_title', 'photo',
+)
+INDEXED_FIELDS = (*USER_FIELDS, 'email', 'is_active', 'update_date')
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е').strip()
+
+
+def get_user_keys(user):
+    """Ключи пользователя: имя, фамилия, отчество и начало email."""
+    values = (
+        user['first_name'], user['last_name'], user['middle_name'],
+        user['email'].split('@')[0],
+    )
+    return {normalize(value) for value in values if value}
+
+
+class PrefixIndex:
+    """
+    Отсортированный список (ключ, id пользователя) в памяти процесса.
+
+    Поиск по префиксу — двоичный поиск границ диапазона, без запросов
+    к БД. Индекс строится при первом обращении; изменения из этого
+    процесса применяются сигналами, изменения из других процессов —
+    синхронизацией по update_date раз в AUTOCOMPLETE_SYNC_INTERVAL
+    секунд. Удаления из других процессов подхватывает полная
+    пересборка раз в AUTOCOMPLETE_REBUILD_INTERVAL секунд.
+    """
+
+    def __init__(self):
+        self.lock = RLock()
+        self.clear()
+
+    def clear(self):
+        """Сбрасывает индекс, он будет построен при следующем поиске."""
+        self.built_at = None
+        self.synced_at = None
+        self.last_update = None
+        self.entries = []
+        self.users = {}
+        self.user_keys = {}
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    @staticmethod
+    def get_last_update(users, default=None):
+        return max((user['update_date'] for user in users), default=default)
+
+    def build(self):
+        users = list(
+            CustomUser.objects.filter(is_active=True).values(*INDEXED_FIELDS)
+        )
+        with self.lock:
+            self.entries = []
+            self.users = {}
+            self.user_keys = {}
+            for user in users:
+                self.add(user, sort=False)
+            self.entries.sort()
+            self.built_at = self.synced_at = monotonic()
+            self.last_update = self.get_last_update(users)
+
+    def sync(self):
+        """Применяет изменения пользователей после last_update."""
+        users = CustomUser.objects.values(*INDEXED_FIELDS)
+        if self.last_update is not None:
+            users = users.filter(update_date__gt=self.last_update)
+        users = list(users)
+        with self.lock:
+            for user in users:
+                self.update(user)
+            self.synced_at = monotonic()
+            self.last_update = self.get_last_update(users, self.last_update)
+
+    def refresh(self):
+        now = monotonic()
+        if (
+            not self.is_built
+            or now - self.built_at > settings.AUTOCOMPLETE_REBUILD_INTERVAL
+        ):
+            self.build()
+        elif now - self.synced_at > settings.AUTOCOMPLETE_SYNC_INTERVAL:
+            self.sync()
+
+    def add(self, user, sort=True):
+        keys = get_user_keys(user)
+        self.users[user['id']] = {field: user[field] for field in USER_FIELDS}
+        self.user_keys[user['id']] = keys
+        for key in keys:
+            if sort:
+                insort(self.entries, (key, user['id']))
+            else:
+                self.entries.append((key, user['id']))
+
+    def remove(self, user_id):
+        with self.lock:
+            for key in self.user_keys.pop(user_id, ()):
+                index = bisect_left(self.entries, (key, user_id))
+                if self.entries[index:index + 1] == [(key, user_id)]:
+                    del self.entries[index]
+            self.users.pop(user_id, None)
+
+    def update(self, user):
+        with self.lock:
+            self.remove(user['id'])
+            if user['is_active']:
+                self.add(user)
+
+    def update_instance(self, instance):
+        """Применяет сохранение пользователя, если индекс уже построен."""
+        if self.is_built:
+            self.update({
+                field: getattr(instance, field) for field in INDEXED_FIELDS
+            } | {'photo': instance.photo.name or None})
+
+    def search(self, prefix, limit):
+        """
+        Пользователи, у которых каждое слово prefix — начало
+        одного из ключей. Порядок — по первому слову.
+        """
+        words = normalize(prefix).split()
+        if not words:
+            return []
+        self.refresh()
+        first, others = words[0], words[1:]
+        found = {}
+        with self.lock:
+            index = bisect_left(self.entries, (first,))
+            while index < len(self.entries) and len(found) < limit:
+                key, user_id = self.entries[index]
+                if not key.startswith(first):
+                    break
+                index += 1
+                if user_id not in found and self.matches(user_id, others):
+                    found[user_id] = self.users[user_id]
+        return list(found.values())
+
+    def matches(self, user_id, words):
+        keys = self.user_keys[user_id]
+        return all(
+            any(key.startswith(word) for key in keys) for word in words
+        )
+
+
+autocomplete_index = PrefixIndex()
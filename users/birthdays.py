@@ -0,0 +1,42 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+from .stamps import BIRTHDAYS, get_stamps, set_stamps
+
+# Поля пользователя, которые входят в список дней рождения.
+BIRTHDAY_LIST_FIELDS = frozenset(
+    ('birthday_date', 'birthday_key', 'photo', 'first_name', 'last_name')
+)
+
+
+def get_birthday_timezone():
+    return ZoneInfo(settings.BIRTHDAY_TIMEZONE)
+
+
+def get_birthday_today():
+    return timezone.localdate(timezone=get_birthday_timezone())
+
+
+def get_birthday_list_key(today):
+    """
+    Ключ кэша списка с отметкой BIRTHDAYS: после её смены в любом
+    процессе прежний список из кэша этого процесса не читается.
+    """
+    stamp, = get_stamps((BIRTHDAYS,))
+    return f'birthday_list:{today.isoformat()}:{stamp}'
+
+
+def get_seconds_until_midnight():
+    """Сколько секунд осталось до конца дня в BIRTHDAY_TIMEZONE."""
+    now = timezone.localtime(timezone=get_birthday_timezone())
+    midnight = datetime.combine(
+        now.date() + timedelta(days=1), time.min, tzinfo=now.tzinfo
+    )
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+def invalidate_birthday_list():
+    set_stamps((BIRTHDAYS,))
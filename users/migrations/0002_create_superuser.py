@@ -1,6 +1,7 @@
 import os
 
-from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import BaseUserManager
 from django.db import migrations
 from dotenv import load_dotenv
 
@@ -9,12 +10,14 @@ def create_superuser(apps, schema_editor):
 
     load_dotenv()
 
-    CustomUser = get_user_model()
+    # Историческая модель: текущая может содержать поля, которые
+    # добавляются более поздними миграциями.
+    CustomUser = apps.get_model('users', 'CustomUser')
 
-    CustomUser.objects.create_superuser(
-        email=os.getenv("SU_EMAIL"),
-        password=os.getenv("SU_PASSWORD"), 
-        is_active=True, is_staff=True
+    CustomUser.objects.create(
+        email=BaseUserManager.normalize_email(os.getenv("SU_EMAIL")),
+        password=make_password(os.getenv("SU_PASSWORD")),
+        is_active=True, is_staff=True, is_superuser=True
     )
     print(f'Superuser {os.getenv("SU_EMAIL")} is created.')
 
@@ -0,0 +1,20 @@
+# Generated by Django 4.1 on 2026-10-18 18:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_customuser_personal_email_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='update_date',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее обновление'),
+            preserve_default=False,
+        ),
+    ]
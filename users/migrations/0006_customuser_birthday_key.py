@@ -0,0 +1,45 @@
+# Generated by Django 4.1 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_birthday_key(apps, schema_editor):
+    """Заполняет birthday_key батчами по диапазонам id."""
+    CustomUser = apps.get_model('users', 'CustomUser')
+    users = CustomUser.objects.filter(birthday_date__isnull=False)
+    bounds = users.aggregate(min_id=models.Min('id'), max_id=models.Max('id'))
+    if bounds['min_id'] is None:
+        return
+    for start in range(bounds['min_id'], bounds['max_id'] + 1, BATCH_SIZE):
+        batch = list(
+            users.filter(id__gte=start, id__lt=start + BATCH_SIZE).only(
+                'id', 'birthday_date'
+            )
+        )
+        for user in batch:
+            user.birthday_key = (
+                user.birthday_date.month * 100 + user.birthday_date.day
+            )
+        CustomUser.objects.bulk_update(batch, ('birthday_key',))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('users', '0005_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='birthday_key',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='День рождения (MMDD)'),
+        ),
+        migrations.RunPython(
+            backfill_birthday_key, migrations.RunPython.noop
+        ),
+    ]
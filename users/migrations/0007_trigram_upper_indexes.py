@@ -0,0 +1,47 @@
+# Generated by Django 4.1 on 2026-10-18 18:40
+
+from django.db import migrations
+
+TRIGRAM_FIELDS = (
+    'last_name', 'first_name', 'job_title', 'department', 'email'
+)
+
+
+def create_upper_trigram_indexes(apps, schema_editor):
+    """
+    icontains на PostgreSQL сравнивает UPPER(поле::text) LIKE UPPER(%s),
+    индексы 0005 по самому полю такое условие не обслуживают.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in TRIGRAM_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            f'users_customuser_{field}_upper_trgm ON users_customuser '
+            f'USING GIN ((UPPER({field}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_upper_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in TRIGRAM_FIELDS:
+        schema_editor.execute(
+            f'DROP INDEX CONCURRENTLY IF EXISTS '
+            f'users_customuser_{field}_upper_trgm'
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('users', '0006_customuser_birthday_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_upper_trigram_indexes, drop_upper_trigram_indexes
+        ),
+    ]
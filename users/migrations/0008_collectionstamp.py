@@ -0,0 +1,24 @@
+# Generated by Django 4.1 on 2026-10-18 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_trigram_upper_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionStamp',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('value', models.UUIDField()),
+            ],
+            options={
+                'verbose_name': 'Отметка коллекции',
+                'verbose_name_plural': 'Отметки коллекций',
+            },
+        ),
+    ]
@@ -8,7 +8,9 @@ from phonenumber_field.modelfields import PhoneNumberField
 
 from api.v1.managers import CustomUserManager
 
-logger = logging.getLogger('django.db.backends')
+from .utils import get_birthday_key
+
+logger = logging.getLogger('audit')
 
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
@@ -48,6 +50,10 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         _('День рождения'), blank=True, null=True,
         help_text=_('Формат: ГГГГ-ММ-ДД/ДД.ММ.ГГГГ')
     )
+    birthday_key = models.PositiveSmallIntegerField(
+        _('День рождения (MMDD)'), blank=True, null=True, editable=False,
+        db_index=True,
+    )
     bio = models.TextField(
         _('Биография'), max_length=500, blank=True, null=True,
         help_text=_('Максимум 500 знаков.')
@@ -60,6 +66,9 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(
         _('Дата создания аккаунта'), default=timezone.now
     )
+    update_date = models.DateTimeField(
+        _('Последнее обновление'), auto_now=True
+    )
     is_staff = models.BooleanField(
         _('Статус администратора'),
         default=False,
@@ -103,11 +112,34 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         using=None, update_fields=None
     ):
         if self.id:
-            logger.info(f'Обновление пользователя - "{self.email}"')
+            logger.info('Обновление пользователя - "%s"', self.email)
         else:
-            logger.info(f'Создание пользователя - "{self.email}"')
+            logger.info('Создание пользователя - "%s"', self.email)
         if not self.personal_phone_number:
             self.personal_phone_number = None
         if not self.personal_email:
             self.personal_email = None
+        self.birthday_date = self._meta.get_field('birthday_date').to_python(
+            self.birthday_date
+        )
+        self.birthday_key = get_birthday_key(self.birthday_date)
+        if update_fields is not None and 'birthday_date' in update_fields:
+            update_fields = {*update_fields, 'birthday_key'}
         super().save(force_insert, force_update, using, update_fields)
+
+
+class CollectionStamp(models.Model):
+    """
+    Отметка коллекции данных (users.stamps). Хранится в БД, чтобы
+    все процессы приложения видели одну и ту же отметку.
+    """
+
+    name = models.CharField(primary_key=True, max_length=32)
+    value = models.UUIDField()
+
+    class Meta:
+        verbose_name = 'Отметка коллекции'
+        verbose_name_plural = 'Отметки коллекций'
+
+    def __str__(self):
+        return self.name
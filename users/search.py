@@ -0,0 +1,129 @@
+import re
+from collections import Counter, defaultdict
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import CustomUser
+from .stamps import USERS, get_stamps
+
+# Для этих полей миграции 0005 и 0007 создают GIN-индексы pg_trgm.
+TRIGRAM_FIELDS = (
+    'last_name', 'first_name', 'job_title', 'department', 'email'
+)
+WORD_RE = re.compile(r'\w+')
+
+
+def get_trigrams(value):
+    """Триграммы слов строки так же, как их считает pg_trgm."""
+    trigrams = set()
+    for word in WORD_RE.findall(value.lower()):
+        padded = f'  {word} '
+        trigrams.update(
+            padded[index:index + 3] for index in range(len(padded) - 2)
+        )
+    return trigrams
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс триграмм пользователей в памяти процесса.
+
+    Используется вместо pg_trgm на SQLite. Поиск перебирает только
+    пользователей с общими триграммами. Индекс перестраивается, когда
+    меняется отметка коллекции пользователей из users.stamps (её меняют
+    сигналы в любом процессе), и не реже раза в
+    TRIGRAM_INDEX_REBUILD_INTERVAL секунд. Пока индекс актуален, поиск
+    читает из БД только отметку.
+    """
+
+    def __init__(self):
+        self.stamp = None
+        self.postings = {}
+        self.lock = Lock()
+
+    @staticmethod
+    def get_stamp():
+        return (
+            *get_stamps((USERS,)),
+            int(monotonic() // settings.TRIGRAM_INDEX_REBUILD_INTERVAL),
+        )
+
+    def refresh(self):
+        stamp = self.get_stamp()
+        if stamp == self.stamp:
+            return
+        with self.lock:
+            if stamp == self.stamp:
+                return
+            postings = defaultdict(set)
+            for user_id, *values in CustomUser.objects.values_list(
+                'pk', *TRIGRAM_FIELDS
+            ).iterator():
+                for value in values:
+                    for trigram in get_trigrams(value or ''):
+                        postings[trigram].add(user_id)
+            self.postings, self.stamp = dict(postings), stamp
+
+    def search(self, query, threshold):
+        """
+        id пользователей и доля триграмм запроса, найденных у них
+        (аналог word_similarity), по убыванию этой доли.
+        """
+        self.refresh()
+        trigrams = get_trigrams(query)
+        if not trigrams:
+            return []
+        matches = Counter()
+        for trigram in trigrams:
+            matches.update(self.postings.get(trigram, ()))
+        ranked = (
+            (user_id, count / len(trigrams))
+            for user_id, count in matches.items()
+        )
+        return sorted(
+            ((user_id, rank) for user_id, rank in ranked
+             if rank >= threshold),
+            key=lambda match: -match[1],
+        )
+
+
+trigram_index = TrigramIndex()
+
+
+def search_users(queryset, query):
+    """
+    Нечёткий поиск пользователей по TRIGRAM_FIELDS с оценкой
+    search_rank, отсортированный по ней.
+    """
+    if connection.vendor == 'postgresql':
+        # %> сравнивает с pg_trgm.word_similarity_threshold базы данных,
+        # icontains обслуживают индексы по UPPER(поле) из миграции 0007.
+        condition = Q()
+        for field in TRIGRAM_FIELDS:
+            condition |= (
+                Q(**{f'{field}__trigram_word_similar': query})
+                | Q(**{f'{field}__icontains': query})
+            )
+        return queryset.filter(condition).annotate(search_rank=Greatest(
+            *(TrigramWordSimilarity(query, field) for field in TRIGRAM_FIELDS)
+        )).order_by('-search_rank', 'last_name', 'id')
+    matches = trigram_index.search(
+        query, settings.TRIGRAM_SIMILARITY_THRESHOLD
+    )[
+        :settings.TRIGRAM_SEARCH_LIMIT
+    ]
+    if not matches:
+        return queryset.none()
+    rank = Case(
+        *(When(pk=user_id, then=Value(rank)) for user_id, rank in matches),
+        output_field=FloatField(),
+    )
+    return queryset.filter(
+        pk__in=[user_id for user_id, _ in matches]
+    ).annotate(search_rank=rank).order_by('-search_rank', 'last_name', 'id')
@@ -0,0 +1,18 @@
+from .stamps import get_stamp, set_stamps
+
+
+def get_short_info_stamp_name(user_id):
+    return f'short_info:{user_id}'
+
+
+def get_short_info_key(user_id):
+    """
+    Ключ кэша карточки с её отметкой: после смены отметки в любом
+    процессе прежняя карточка из кэша этого процесса не читается.
+    """
+    stamp = get_stamp(get_short_info_stamp_name(user_id))
+    return f'short_info:{user_id}:{stamp}'
+
+
+def invalidate_short_info(user_id):
+    set_stamps((get_short_info_stamp_name(user_id),))
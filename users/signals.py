@@ -1,13 +1,65 @@
 import logging
+from functools import partial
 
-from django.db.models.signals import post_delete
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from .autocomplete import autocomplete_index
+from .birthdays import BIRTHDAY_LIST_FIELDS, invalidate_birthday_list
 from .models import CustomUser
+from .short_info import invalidate_short_info
+from .stamps import USERS, touch
 
-logger = logging.getLogger('django.db.backends')
+# Поля пользователя, которые входят в карточку users/short_info.
+SHORT_INFO_FIELDS = frozenset(('first_name', 'middle_name', 'job_title'))
+
+logger = logging.getLogger('audit')
 
 
 @receiver(post_delete, sender=CustomUser)
 def delete_log_handler(sender, instance, *args, **kwargs):
-    logger.info(f'Удаление пользователя - "{instance.email}"')
+    logger.info('Удаление пользователя - "%s"', instance.email)
+
+
+@receiver(post_save, sender=CustomUser)
+def update_autocomplete_handler(sender, instance, *args, **kwargs):
+    transaction.on_commit(
+        partial(autocomplete_index.update_instance, instance)
+    )
+
+
+@receiver(post_delete, sender=CustomUser)
+def remove_autocomplete_handler(sender, instance, *args, **kwargs):
+    transaction.on_commit(partial(autocomplete_index.remove, instance.pk))
+
+
+@receiver(post_save, sender=CustomUser)
+def birthday_list_changed_handler(sender, instance, update_fields,
+                                  *args, **kwargs):
+    if update_fields is None or not BIRTHDAY_LIST_FIELDS.isdisjoint(
+        update_fields
+    ):
+        transaction.on_commit(invalidate_birthday_list)
+
+
+@receiver(post_delete, sender=CustomUser)
+def birthday_list_deleted_handler(sender, instance, *args, **kwargs):
+    transaction.on_commit(invalidate_birthday_list)
+
+
+@receiver(post_save, sender=CustomUser)
+def short_info_profile_changed_handler(sender, instance, update_fields,
+                                       *args, **kwargs):
+    if update_fields is None or not SHORT_INFO_FIELDS.isdisjoint(
+        update_fields
+    ):
+        transaction.on_commit(partial(invalidate_short_info, instance.pk))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def users_stamp_handler(sender, *args, update_fields=None, **kwargs):
+    """Вход пользователя меняет только last_login, которого нет в API."""
+    if update_fields != {'last_login'}:
+        touch(USERS)
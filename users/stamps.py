@@ -0,0 +1,69 @@
+from functools import partial
+from uuid import uuid4
+
+from django.db import transaction
+
+from .models import CollectionStamp
+
+# Коллекции, изменение которых меняет ETag списков API.
+POSTS = 'posts'
+USERS = 'users'
+GROUPS = 'groups'
+FOLLOWERS = 'followers'
+# Список дней рождения, его отметка входит в ключ кэша списка.
+BIRTHDAYS = 'birthdays'
+
+
+def get_stamps(collections):
+    """
+    Отметки коллекций из таблицы CollectionStamp, общей для всех
+    процессов. Отметка, которой ещё нет, создаётся новой.
+    """
+    stamps = dict(
+        CollectionStamp.objects.filter(name__in=collections).values_list(
+            'name', 'value'
+        )
+    )
+    missing = [name for name in collections if name not in stamps]
+    if missing:
+        CollectionStamp.objects.bulk_create(
+            [CollectionStamp(name=name, value=uuid4()) for name in missing],
+            ignore_conflicts=True,
+        )
+        stamps.update(
+            CollectionStamp.objects.filter(name__in=missing).values_list(
+                'name', 'value'
+            )
+        )
+    return [stamps[name].hex for name in collections]
+
+
+def get_stamp(collection):
+    """
+    Отметка коллекции без её создания: пустая строка, пока коллекцию
+    не меняли. Для коллекций отдельных объектов, которых много.
+    """
+    value = CollectionStamp.objects.filter(name=collection).values_list(
+        'value', flat=True
+    ).first()
+    return value.hex if value else ''
+
+
+def set_stamps(collections):
+    value = uuid4()
+    CollectionStamp.objects.bulk_create(
+        [CollectionStamp(name=name, value=value) for name in collections],
+        update_conflicts=True,
+        unique_fields=('name',),
+        update_fields=('value',),
+    )
+
+
+def touch(*collections):
+    """
+    Меняет отметки коллекций сразу и ещё раз после фиксации транзакции:
+    ETag ответа, собранного до фиксации, тоже устареет.
+    """
+    set_stamps(collections)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(set_stamps, collections))
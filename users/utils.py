@@ -0,0 +1,5 @@
+def get_birthday_key(date):
+    """День рождения в виде числа MMDD: сортируется как дата без года."""
+    if date is None:
+        return None
+    return date.month * 100 + date.day